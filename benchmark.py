@@ -0,0 +1,54 @@
+#!/bin/env python
+"""Measure the python-side time spent on search statements before they are sent to the database.
+
+Compares building and compiling the search statements on every request with the cached statements.
+Runs against the database configured in `SQL_URI`.
+"""
+import time
+from sqlalchemy import event
+
+from stickerfinder.db import engine, get_session
+from stickerfinder.models import User
+from stickerfinder.telegram.inline_query import sql_query
+from stickerfinder.telegram.inline_query.context import Context
+
+RUNS = 200
+QUERIES = ['cat', 'happy cat', 'happy cat dance', 'angry dog bark loud']
+
+sent_at = []
+
+
+@event.listens_for(engine, 'before_cursor_execute')
+def record_send(conn, cursor, statement, parameters, context, executemany):
+    """Remember, when the statement is handed to the database driver."""
+    sent_at.append(time.perf_counter())
+
+
+def measure(session, context, uncached):
+    """Get the average time between calling the search and sending the statement."""
+    total = 0
+    for _ in range(RUNS):
+        if uncached:
+            sql_query.statement_cache.clear()
+            sql_query.compiled_cache.clear()
+
+        start = time.perf_counter()
+        sql_query.get_strict_matching_stickers(session, context)
+        total += sent_at[-1] - start
+
+    return total / RUNS
+
+
+session = get_session()
+user = User(0, 'benchmark')
+user.is_default_language = True
+user.deluxe = False
+
+for query in QUERIES:
+    context = Context(query, '', user)
+    uncached = measure(session, context, uncached=True)
+    cached = measure(session, context, uncached=False)
+    print(f'{len(context.tags)} tags: {uncached * 1000:.3f}ms uncached, '
+          f'{cached * 1000:.3f}ms cached, {(uncached - cached) * 1000:.3f}ms saved per request')
+
+session.close()
@@ -0,0 +1,74 @@
+#!/bin/env python
+"""Measure strict search on a corpus, in which the matching stickers are used by many users.
+
+The corpus is created inside a transaction, which is rolled back afterwards.
+Runs against the database configured in `SQL_URI`.
+"""
+import time
+from sqlalchemy.orm import Session
+
+from stickerfinder.db import engine
+from stickerfinder.models import User
+from stickerfinder.telegram.inline_query import sql_query
+from stickerfinder.telegram.inline_query.context import Context
+
+RUNS = 20
+SETS = 1000
+STICKERS_PER_SET = 50
+USERS = 1000
+# The first stickers are tagged with `shared` and used by every user
+SHARED_STICKERS = 500
+
+connection = engine.connect()
+transaction = connection.begin()
+
+connection.execute(f"""
+    INSERT INTO sticker_set (name, title, is_default_language, deleted, banned, nsfw, furry, deluxe,
+                             complete, completely_tagged, reviewed, sticker_count, preview_file_ids)
+    SELECT 'bench_set_' || i, 'Bench set ' || i, true, false, false, false, false, false,
+           true, false, true, {STICKERS_PER_SET}, '{{}}'
+    FROM generate_series(1, {SETS}) i
+""")
+connection.execute(f"""
+    INSERT INTO sticker (file_id, sticker_set_name, text)
+    SELECT 'bench_sticker_' || i, 'bench_set_' || (i %% {SETS} + 1), null
+    FROM generate_series(1, {SETS * STICKERS_PER_SET}) i
+""")
+connection.execute("""
+    INSERT INTO tag (name, is_default_language, emoji)
+    VALUES ('shared', true, false)
+""")
+connection.execute(f"""
+    INSERT INTO sticker_tag (sticker_file_id, tag_name)
+    SELECT 'bench_sticker_' || i, 'shared'
+    FROM generate_series(1, {SHARED_STICKERS}) i
+""")
+connection.execute(f"""
+    INSERT INTO "user" (id, username, is_default_language, deluxe, banned, reverted, admin, authorized,
+                        change_count, unchecked_change_count, unchecked_international_change_count)
+    SELECT -i, 'bench_user_' || i, true, false, false, false, false, false, 0, 0, 0
+    FROM generate_series(1, {USERS}) i
+""")
+connection.execute(f"""
+    INSERT INTO sticker_usage (sticker_file_id, user_id, usage_count)
+    SELECT 'bench_sticker_' || sticker, -usr, (sticker + usr) %% 7
+    FROM generate_series(1, {SHARED_STICKERS}) sticker, generate_series(1, {USERS}) usr
+""")
+connection.execute('ANALYZE')
+
+session = Session(bind=connection)
+user = session.query(User).get(-1)
+context = Context('shared', '', user)
+
+sql_query.get_strict_matching_stickers(session, context)
+start = time.perf_counter()
+for _ in range(RUNS):
+    results = sql_query.get_strict_matching_stickers(session, context)
+duration = (time.perf_counter() - start) / RUNS
+
+print(f'{SHARED_STICKERS} stickers used by {USERS} users each: {duration * 1000:.3f}ms per search, '
+      f'{len(results)} results, {len(set(result[0] for result in results))} distinct stickers')
+
+session.close()
+transaction.rollback()
+connection.close()
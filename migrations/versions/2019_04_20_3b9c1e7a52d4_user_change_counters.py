@@ -0,0 +1,53 @@
+"""User change counters
+
+Revision ID: 3b9c1e7a52d4
+Revises: aa5613fcff22
+Create Date: 2019-04-20 14:12:31.402856
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9c1e7a52d4'
+down_revision = 'aa5613fcff22'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('change_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('user', sa.Column('unchecked_change_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('user', sa.Column('unchecked_international_change_count', sa.Integer(), server_default='0', nullable=False))
+    op.alter_column('user', 'change_count', server_default=None)
+    op.alter_column('user', 'unchecked_change_count', server_default=None)
+    op.alter_column('user', 'unchecked_international_change_count', server_default=None)
+    op.create_index(op.f('ix_user_unchecked_change_count'), 'user', ['unchecked_change_count'], unique=False)
+    op.create_index(op.f('ix_user_unchecked_international_change_count'), 'user',
+                    ['unchecked_international_change_count'], unique=False)
+
+    op.execute("""
+UPDATE "user" SET
+    change_count = (
+        SELECT count(change.id) FROM change
+        WHERE change.user_id = "user".id),
+    unchecked_change_count = (
+        SELECT count(change.id) FROM change
+        WHERE change.user_id = "user".id
+            AND change.check_task_id IS NULL
+            AND change.is_default_language IS true),
+    unchecked_international_change_count = (
+        SELECT count(change.id) FROM change
+        WHERE change.user_id = "user".id
+            AND change.check_task_id IS NULL
+            AND change.is_default_language IS false)
+""")
+
+
+def downgrade():
+    op.drop_index(op.f('ix_user_unchecked_international_change_count'), table_name='user')
+    op.drop_index(op.f('ix_user_unchecked_change_count'), table_name='user')
+    op.drop_column('user', 'unchecked_international_change_count')
+    op.drop_column('user', 'unchecked_change_count')
+    op.drop_column('user', 'change_count')
@@ -0,0 +1,23 @@
+"""Task queue index
+
+Revision ID: 5f0d7b3e21c9
+Revises: 3b9c1e7a52d4
+Create Date: 2019-04-21 11:40:07.118205
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5f0d7b3e21c9'
+down_revision = '3b9c1e7a52d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_task_type_reviewed_created_at', 'task', ['type', 'reviewed', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_task_type_reviewed_created_at', table_name='task')
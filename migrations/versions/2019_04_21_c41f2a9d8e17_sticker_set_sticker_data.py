@@ -0,0 +1,42 @@
+"""Denormalized sticker data for sticker sets
+
+Revision ID: c41f2a9d8e17
+Revises: 5f0d7b3e21c9
+Create Date: 2019-04-21 16:03:52.550371
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f2a9d8e17'
+down_revision = '5f0d7b3e21c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('sticker_set', sa.Column('sticker_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('sticker_set', sa.Column('preview_file_ids', postgresql.ARRAY(sa.String()),
+                                           server_default='{}', nullable=False))
+    op.alter_column('sticker_set', 'sticker_count', server_default=None)
+    op.alter_column('sticker_set', 'preview_file_ids', server_default=None)
+
+    op.execute("""
+UPDATE sticker_set SET
+    sticker_count = (
+        SELECT count(sticker.file_id) FROM sticker
+        WHERE sticker.sticker_set_name = sticker_set.name),
+    preview_file_ids = ARRAY(
+        SELECT sticker.file_id FROM sticker
+        WHERE sticker.sticker_set_name = sticker_set.name
+        ORDER BY sticker.file_id DESC
+        LIMIT 5)
+""")
+
+
+def downgrade():
+    op.drop_column('sticker_set', 'preview_file_ids')
+    op.drop_column('sticker_set', 'sticker_count')
@@ -0,0 +1,23 @@
+"""Index for walking through the stickers of a set
+
+Revision ID: e82b6c0f9a31
+Revises: c41f2a9d8e17
+Create Date: 2019-04-22 09:17:44.981270
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e82b6c0f9a31'
+down_revision = 'c41f2a9d8e17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('sticker_sticker_set_name_file_id_idx', 'sticker', ['sticker_set_name', 'file_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('sticker_sticker_set_name_file_id_idx', table_name='sticker')
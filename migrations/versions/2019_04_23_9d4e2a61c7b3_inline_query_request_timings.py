@@ -0,0 +1,27 @@
+"""Per-phase timings and query plans for inline query requests
+
+Revision ID: 9d4e2a61c7b3
+Revises: e82b6c0f9a31
+Create Date: 2019-04-23 18:42:11.530127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4e2a61c7b3'
+down_revision = 'e82b6c0f9a31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('inline_query_request', sa.Column('timings', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.add_column('inline_query_request', sa.Column('query_plans', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade():
+    op.drop_column('inline_query_request', 'query_plans')
+    op.drop_column('inline_query_request', 'timings')
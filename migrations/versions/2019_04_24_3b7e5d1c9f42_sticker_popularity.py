@@ -0,0 +1,31 @@
+"""Precomputed global sticker popularity
+
+Revision ID: 3b7e5d1c9f42
+Revises: 9d4e2a61c7b3
+Create Date: 2019-04-24 20:13:48.204531
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e5d1c9f42'
+down_revision = '9d4e2a61c7b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'sticker_popularity',
+        sa.Column('sticker_file_id', sa.String(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['sticker_file_id'], ['sticker.file_id'], onupdate='cascade', ondelete='cascade', deferrable=True),
+        sa.PrimaryKeyConstraint('sticker_file_id')
+    )
+
+
+def downgrade():
+    op.drop_table('sticker_popularity')
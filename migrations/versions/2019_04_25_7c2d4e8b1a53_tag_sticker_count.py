@@ -0,0 +1,33 @@
+"""Tag sticker counts
+
+Revision ID: 7c2d4e8b1a53
+Revises: 3b7e5d1c9f42
+Create Date: 2019-04-25 18:42:07.913256
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2d4e8b1a53'
+down_revision = '3b7e5d1c9f42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tag', sa.Column('sticker_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute("""
+UPDATE tag SET sticker_count = counts.sticker_count
+FROM (
+    SELECT tag_name, count(sticker_file_id) AS sticker_count FROM sticker_tag
+    GROUP BY tag_name
+) AS counts
+WHERE counts.tag_name = tag.name
+""")
+
+
+def downgrade():
+    op.drop_column('tag', 'sticker_count')
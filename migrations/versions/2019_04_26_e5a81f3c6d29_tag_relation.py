@@ -0,0 +1,32 @@
+"""Precomputed related tags
+
+Revision ID: e5a81f3c6d29
+Revises: 7c2d4e8b1a53
+Create Date: 2019-04-26 11:27:53.604198
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a81f3c6d29'
+down_revision = '7c2d4e8b1a53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'tag_relation',
+        sa.Column('tag_name', sa.String(), nullable=False),
+        sa.Column('related_tag_name', sa.String(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['tag_name'], ['tag.name'], onupdate='cascade', ondelete='cascade', deferrable=True),
+        sa.ForeignKeyConstraint(['related_tag_name'], ['tag.name'], onupdate='cascade', ondelete='cascade', deferrable=True),
+        sa.PrimaryKeyConstraint('tag_name', 'related_tag_name')
+    )
+
+
+def downgrade():
+    op.drop_table('tag_relation')
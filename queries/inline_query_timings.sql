@@ -0,0 +1,11 @@
+-- Histogram of the time spent in each inline search phase during the last day.
+-- Buckets are 25ms wide, everything above 2.5s ends up in the last bucket.
+SELECT
+    timing.key AS phase,
+    least(width_bucket(timing.value::numeric, 0, 2500, 100), 101) AS bucket,
+    (least(width_bucket(timing.value::numeric, 0, 2500, 100), 101) - 1) * 25 AS from_ms,
+    count(*) AS requests
+FROM inline_query_request, jsonb_each_text(inline_query_request.timings) AS timing
+WHERE inline_query_request.created_at > now() - interval '1 day'
+GROUP BY phase, bucket
+ORDER BY phase, bucket;
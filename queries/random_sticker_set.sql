@@ -0,0 +1,25 @@
+-- Compare the old random set picker with the sampled one.
+-- Run both with `psql -f queries/random_sticker_set.sql` against a production dump.
+
+-- Old: join every set with all of its stickers and sort the whole result by random()
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT sticker_set.name FROM sticker_set
+    JOIN sticker ON sticker_set.name = sticker.sticker_set_name
+WHERE sticker_set.is_default_language IS true
+    AND sticker_set.nsfw IS false
+    AND sticker_set.furry IS false
+    AND sticker_set.banned IS false
+GROUP BY sticker_set.name
+HAVING count(sticker.file_id) > 0
+ORDER BY random() LIMIT 1;
+
+-- New: only look at a sample of the sticker_set table and use the stored sticker count.
+-- The fallback to the full table runs the same query without TABLESAMPLE.
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT sampled_sticker_set.* FROM sticker_set AS sampled_sticker_set TABLESAMPLE system(2)
+WHERE sampled_sticker_set.is_default_language IS true
+    AND sampled_sticker_set.nsfw IS false
+    AND sampled_sticker_set.furry IS false
+    AND sampled_sticker_set.banned IS false
+    AND sampled_sticker_set.sticker_count > 0
+ORDER BY random() LIMIT 1;
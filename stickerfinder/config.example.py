@@ -8,6 +8,8 @@ class Config:
     # Get your telegram api-key from @botfather
     TELEGRAM_API_KEY = None
     SQL_URI = "postgres://localhost/stickerfinder"
+    # Read replicas for search queries. Reads fall back to SQL_URI, if there are no healthy replicas.
+    SQL_READ_URI = []
     SENTRY_TOKEN = None
     LOG_LEVEL = logging.INFO
 
@@ -30,6 +32,17 @@ class Config:
     CONNECTION_COUNT = 20
     OVERFLOW_COUNT = 10
 
+    # Capture `EXPLAIN (ANALYZE, BUFFERS)` for a sample of inline search queries,
+    # which take longer than this amount of milliseconds. None disables sampling.
+    SEARCH_EXPLAIN_THRESHOLD = None
+    SEARCH_EXPLAIN_SAMPLE_RATE = 0.1
+    # Maximum amount of stickers, which are taken from each candidate lookup of the strict search.
+    SEARCH_CANDIDATE_LIMIT = 5000
+    # Weight of the global sticker popularity in the strict search score. 0 disables the popularity term.
+    POPULARITY_WEIGHT = 0
+    # Weight matching tags by their inverse document frequency instead of counting each of them as 1.
+    TAG_IDF_SCORING = False
+
     # Job parameter
     USER_CHECK_COUNT = 200
     REPORT_COUNT = 1
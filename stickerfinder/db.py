@@ -1,18 +1,170 @@
 """Helper class to get a database engine and to get a session."""
+import time
+import logging
+from threading import Lock
+from contextlib import contextmanager
 from stickerfinder.config import config
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError, TimeoutError
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm.session import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
+
+class PoolMetrics:
+    """Collect the time threads spend waiting for a database connection."""
+
+    def __init__(self):
+        """Create empty metrics."""
+        self.lock = Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0
+        self.max_wait = 0
+
+    def record_wait(self, duration, timed_out=False):
+        """Record a single connection checkout."""
+        with self.lock:
+            self.checkouts += 1
+            self.total_wait += duration
+            self.max_wait = max(self.max_wait, duration)
+            if timed_out:
+                self.timeouts += 1
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeasuredQueuePool(QueuePool):
+    """QueuePool, which records how long each checkout waits for a free connection."""
+
+    def _do_get(self):
+        start = time.monotonic()
+        try:
+            connection = super()._do_get()
+        except TimeoutError:
+            pool_metrics.record_wait(time.monotonic() - start, timed_out=True)
+            logger = logging.getLogger()
+            logger.warning(f'Database pool exhausted: {self.status()}')
+            raise
+
+        pool_metrics.record_wait(time.monotonic() - start)
+        return connection
+
+
 engine = create_engine(config.SQL_URI,
+                       poolclass=MeasuredQueuePool,
                        pool_size=config.CONNECTION_COUNT,
                        max_overflow=config.OVERFLOW_COUNT,
                        echo=False)
 base = declarative_base(bind=engine)
+Session = sessionmaker(bind=engine)
+
+
+class ReadEngineRouter:
+    """Distribute read-only sessions over read replicas in a round-robin fashion.
+
+    Replicas, which fail with a connection error, are skipped for `retry_after` seconds.
+    """
+
+    def __init__(self, engines, retry_after=30):
+        """Create a new router."""
+        self.engines = engines
+        self.retry_after = retry_after
+        self.unhealthy_until = {}
+        self.position = 0
+        self.lock = Lock()
+
+        for read_engine in engines:
+            event.listen(read_engine, 'handle_error', self.handle_error)
+
+    def handle_error(self, context):
+        """Mark the replica as unhealthy on connection errors."""
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+            self.mark_unhealthy(context.engine)
+
+    def mark_unhealthy(self, read_engine):
+        """Skip this replica for a while."""
+        with self.lock:
+            self.unhealthy_until[read_engine] = time.monotonic() + self.retry_after
+
+        logger = logging.getLogger()
+        logger.warning(f'Read replica {read_engine.url} is unhealthy.')
+
+    def get_engine(self):
+        """Get the next healthy replica or None, if there is none."""
+        now = time.monotonic()
+        with self.lock:
+            for _ in range(len(self.engines)):
+                read_engine = self.engines[self.position % len(self.engines)]
+                self.position += 1
+                if self.unhealthy_until.get(read_engine, 0) <= now:
+                    return read_engine
+
+        return None
+
+
+read_engines = ReadEngineRouter([
+    create_engine(uri,
+                  pool_size=config.CONNECTION_COUNT,
+                  max_overflow=config.OVERFLOW_COUNT,
+                  pool_pre_ping=True,
+                  echo=False)
+    for uri in config.SQL_READ_URI
+])
 
 
 def get_session(connection=None):
     """Get a new db session."""
-    session = scoped_session(sessionmaker(bind=engine))
-    return session
+    return Session()
+
+
+@contextmanager
+def session_scope():
+    """Provide a session, which is committed on success and rolled back on failure."""
+    session = get_session()
+    try:
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+@contextmanager
+def read_session_scope(session):
+    """Provide a session for read-only queries.
+
+    The session is bound to the next healthy read replica.
+    Without any healthy replica, the given primary session is used instead.
+    """
+    read_engine = read_engines.get_engine()
+    if read_engine is None:
+        yield session
+        return
+
+    read_session = Session(bind=read_engine)
+    try:
+        yield read_session
+    finally:
+        read_session.close()
+
+
+def get_pool_status():
+    """Get the current state of the connection pool and the collected wait times."""
+    pool = engine.pool
+    with pool_metrics.lock:
+        checkouts = pool_metrics.checkouts
+        average_wait = pool_metrics.total_wait / checkouts if checkouts > 0 else 0
+        return {
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(0, pool.overflow()),
+            'max_overflow': config.OVERFLOW_COUNT,
+            'checkouts': checkouts,
+            'timeouts': pool_metrics.timeouts,
+            'average_wait': average_wait,
+            'max_wait': pool_metrics.max_wait,
+        }
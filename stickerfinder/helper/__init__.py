@@ -23,7 +23,7 @@ For a more detailed explanation (especially if you want to tag) use /help :)
 """
 
 
-admin_help_text = """Commands available to admins:
+admin_help_text = r"""Commands available to admins:
 
 /ban Ban the last sticker posted in this chat.
 /unban Ban the last sticker posted in this chat.
@@ -43,6 +43,7 @@ admin_help_text = """Commands available to admins:
 /stats Get some statistics
 /refresh Refresh all stickerpacks.
 /refresh\_ocr Refresh all stickerpacks including ocr.
+/refresh\_counters Recompute all precomputed counters.
 /broadcast Send the message after this command to all users.
 """
 
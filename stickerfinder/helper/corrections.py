@@ -1,3 +1,6 @@
 """Class for correcting/shrinking stickers."""
 
 ignored_characters = set(['\n', ',', '.', '!', '?', "'", '@'])
+
+# Zero width joiner, variation selectors and the keycap, which are part of composed emojis
+emoji_modifiers = set(['\u200d', '\ufe0e', '\ufe0f', '\u20e3'])
@@ -0,0 +1,119 @@
+"""In-memory cache of the most used stickers of each user."""
+from collections import OrderedDict
+from threading import Lock
+
+
+class FavoriteList:
+    """The most used stickers of a user in a single nsfw/furry mode.
+
+    Stickers are ordered like the favorite query: by usage count and the latest usage first.
+    `complete` is True, if the list contains every used sticker of this mode.
+    """
+
+    def __init__(self, favorites, size):
+        """Create a new list from (file_id, usage_count) rows."""
+        self.favorites = [(file_id, usage_count) for file_id, usage_count in favorites[:size]]
+        self.complete = len(favorites) < size
+
+    def covers(self, offset, limit):
+        """Check whether this slice can be answered from the list."""
+        return self.complete or offset + limit <= len(self.favorites)
+
+    def record_usage(self, file_id, usage_count, size):
+        """Move a used sticker to its new position.
+
+        Returns False, if the position of the sticker is unknown.
+        """
+        cached = [index for index, favorite in enumerate(self.favorites) if favorite[0] == file_id]
+        if cached:
+            index = cached[0]
+            if usage_count is None:
+                usage_count = self.favorites[index][1] + 1
+            del self.favorites[index]
+        elif usage_count is None:
+            # Stickers, which aren't part of a complete list, haven't been used yet.
+            if not self.complete:
+                return False
+            usage_count = 1
+
+        # The sticker has just been used, so it's the first of all stickers with the same count.
+        position = 0
+        while position < len(self.favorites) and self.favorites[position][1] > usage_count:
+            position += 1
+
+        # Uncached stickers might rank below uncached stickers of incomplete lists
+        if position == len(self.favorites) and not cached and not self.complete:
+            return True
+
+        self.favorites.insert(position, (file_id, usage_count))
+        if len(self.favorites) > size:
+            self.favorites = self.favorites[:size]
+            self.complete = False
+
+        return True
+
+
+class FavoriteCache:
+    """Most used stickers of recently active users.
+
+    Lists are kept for the `max_users` most recently active users and hold
+    up to `size` stickers for each nsfw/furry mode.
+    """
+
+    def __init__(self, max_users, size):
+        """Create an empty cache."""
+        self.max_users = max_users
+        self.size = size
+        self.users = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, user_id, nsfw, furry, offset, limit):
+        """Get a slice of a user's favorites or None, if it isn't cached."""
+        with self.lock:
+            modes = self.users.get(user_id)
+            if modes is None:
+                return None
+
+            self.users.move_to_end(user_id)
+            favorite_list = modes.get((nsfw, furry))
+            if favorite_list is None or not favorite_list.covers(offset, limit):
+                return None
+
+            return favorite_list.favorites[offset:offset + limit]
+
+    def set(self, user_id, nsfw, furry, favorites):
+        """Remember the first favorites of a user for this mode."""
+        with self.lock:
+            modes = self.users.setdefault(user_id, {})
+            modes[(nsfw, furry)] = FavoriteList(favorites, self.size)
+            self.users.move_to_end(user_id)
+
+            while len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+
+    def record_usage(self, user_id, nsfw, furry, file_id, usage_count=None):
+        """Update the cached favorites of a user after a sticker has been used.
+
+        Without a `usage_count`, the cached count is incremented.
+        If the new position of the sticker can't be determined, the list of this mode is dropped.
+        """
+        with self.lock:
+            modes = self.users.get(user_id)
+            if modes is None or (nsfw, furry) not in modes:
+                return
+
+            if not modes[(nsfw, furry)].record_usage(file_id, usage_count, self.size):
+                del modes[(nsfw, furry)]
+
+    def forget_user(self, user_id):
+        """Drop all cached favorites of a user."""
+        with self.lock:
+            self.users.pop(user_id, None)
+
+    def clear(self):
+        """Drop all cached favorites."""
+        with self.lock:
+            self.users = OrderedDict()
+
+
+favorites = FavoriteCache(max_users=20000, size=200)
@@ -1,9 +1,22 @@
 """Helper functions for maintenance."""
-from sqlalchemy import func
-from telegram.error import BadRequest, ChatMigrated
-
+from collections import Counter
+from uuid import uuid4
+from sqlalchemy import func, exists, literal, select, tuple_, union_all
+from sqlalchemy.orm import selectinload
+from sqlalchemy.dialects.postgresql import insert
+from telegram.error import BadRequest, ChatMigrated, Unauthorized
+
+from stickerfinder.config import config
 from stickerfinder.helper.text import split_text
 from stickerfinder.helper.telegram import call_tg_func
+from stickerfinder.helper.sticker_set import get_first_sticker
+from stickerfinder.helper.task_queue import (
+    claim_next_task,
+    forget_live_chat,
+    get_live_chat,
+    has_open_tasks,
+    pending_tasks,
+)
 from stickerfinder.helper.keyboard import (
     admin_keyboard,
     check_user_tags_keyboard,
@@ -13,9 +26,113 @@ from stickerfinder.helper.keyboard import (
 from stickerfinder.models import (
     Chat,
     Change,
+    Report,
     Task,
     StickerSet,
+    Tag,
+    User,
+    sticker_tag,
 )
+from stickerfinder.models.change import change_added_tags, change_removed_tags
+
+
+MAINTENANCE_TASK_TYPES = [Task.CHECK_USER_TAGS, Task.REPORT]
+
+# The amount of sticker tags, which are added or removed per statement while reverting changes.
+REVERT_BATCH_SIZE = 1000
+
+# The id of the newest report, which has already been inspected by `create_report_tasks`.
+# This is reset on restart, which results in a single full scan of all reports.
+last_inspected_report_id = 0
+
+
+def create_report_tasks(session):
+    """Create report tasks for sticker sets, which got enough reports since the last run.
+
+    Only sets with new reports can become new candidates, since
+    any set with an existing report task is ignored anyway.
+    Returns the created tasks and the id of the newest inspected report, which should be
+    passed to `mark_reports_inspected` after the tasks have been committed.
+    """
+    newest_report_id = session.query(func.max(Report.id)).scalar()
+    if newest_report_id is None or newest_report_id <= last_inspected_report_id:
+        return [], last_inspected_report_id
+
+    new_report_sets = session.query(Report.sticker_set_name) \
+        .filter(Report.id > last_inspected_report_id) \
+        .filter(Report.id <= newest_report_id)
+
+    existing_task = exists() \
+        .where(Task.sticker_set_name == Report.sticker_set_name) \
+        .where(Task.type == Task.REPORT)
+
+    report_count = func.count(Report.id)
+    candidates = session.query(Report.sticker_set_name) \
+        .join(Report.sticker_set) \
+        .filter(Report.sticker_set_name.in_(new_report_sets.subquery())) \
+        .filter(StickerSet.banned.is_(False)) \
+        .filter(~existing_task) \
+        .group_by(Report.sticker_set_name) \
+        .having(report_count >= config.REPORT_COUNT) \
+        .all()
+
+    tasks = [{
+        'id': uuid4(),
+        'type': Task.REPORT,
+        'sticker_set_name': name,
+    } for (name, ) in candidates]
+    if len(tasks) > 0:
+        session.execute(Task.__table__.insert(), tasks)
+        pending_tasks.add(Task.REPORT, len(tasks))
+
+    return tasks, newest_report_id
+
+
+def mark_reports_inspected(report_id):
+    """Skip all reports up to this id in future runs of `create_report_tasks`."""
+    global last_inspected_report_id
+    last_inspected_report_id = max(last_inspected_report_id, report_id)
+
+
+def create_user_check_tasks(session, is_default_language):
+    """Create check tasks for all users with enough unchecked changes in this language."""
+    if is_default_language:
+        unchecked_count = User.unchecked_change_count
+    else:
+        unchecked_count = User.unchecked_international_change_count
+
+    user_ids = session.query(User.id) \
+        .filter(unchecked_count >= config.USER_CHECK_COUNT) \
+        .all()
+    if len(user_ids) == 0:
+        return []
+
+    tasks = [{
+        'id': uuid4(),
+        'type': Task.CHECK_USER_TAGS,
+        'user_id': user_id,
+        'is_default_language': is_default_language,
+    } for (user_id, ) in user_ids]
+    session.execute(Task.__table__.insert(), tasks)
+    pending_tasks.add(Task.CHECK_USER_TAGS, len(tasks))
+    task_ids = [task['id'] for task in tasks]
+
+    # Reset the counters before assigning the changes.
+    # Concurrent changes then either get assigned or keep their increment, since
+    # the user rows stay locked until the end of this transaction.
+    session.query(User) \
+        .filter(User.id.in_([user_id for (user_id, ) in user_ids])) \
+        .update({unchecked_count: 0}, synchronize_session=False)
+
+    # Assign all unchecked changes to the task of their user
+    session.query(Change) \
+        .filter(Change.user_id == Task.user_id) \
+        .filter(Task.id.in_(task_ids)) \
+        .filter(Change.check_task_id.is_(None)) \
+        .filter(Change.is_default_language.is_(is_default_language)) \
+        .update({Change.check_task_id: Task.id}, synchronize_session=False)
+
+    return tasks
 
 
 def distribute_newsfeed_tasks(bot, session, chats=None):
@@ -37,16 +154,7 @@ def distribute_newsfeed_tasks(bot, session, chats=None):
 def check_newsfeed_chat(bot, session, chat):
     """Check if this chat should get a new sticker for inspection."""
     # Get all tasks of added sticker sets, which have been scanned and aren't currently assigned to a chat.
-    next_task = session.query(Task) \
-        .filter(Task.type == Task.SCAN_SET) \
-        .join(Task.sticker_set) \
-        .outerjoin(Task.processing_chat) \
-        .filter(Chat.current_task_id.is_(None)) \
-        .filter(StickerSet.complete.is_(True)) \
-        .filter(Task.reviewed.is_(False)) \
-        .order_by(Task.created_at.asc()) \
-        .limit(1) \
-        .one_or_none()
+    next_task = claim_next_task(session, [Task.SCAN_SET], Task.sticker_set.has(complete=True))
 
     # No more tasks
     if next_task is None:
@@ -55,25 +163,21 @@ def check_newsfeed_chat(bot, session, chat):
 
     # TODO: HANDLE
     # Sticker set with zero stickers
-    if len(next_task.sticker_set.stickers) == 0:
-        session.delete(next_task.sticker_set)
+    new_set = next_task.sticker_set
+    first_sticker = get_first_sticker(session, new_set)
+    if first_sticker is None:
+        session.delete(new_set)
         session.delete(next_task)
+        pending_tasks.add(Task.SCAN_SET, -1)
         return
 
-    new_set = next_task.sticker_set
-
-    task_count = session.query(func.count(Task.id)) \
-        .filter(Task.type == Task.SCAN_SET) \
-        .filter(Task.reviewed.is_(False)) \
-        .one()
-
-    task_count = task_count[0]
+    task_count = pending_tasks.get(session, Task.SCAN_SET)
 
     # Add the keyboard for managing this specific sticker set.
     try:
         keyboard = get_nsfw_ban_keyboard(new_set)
         call_tg_func(bot, 'send_sticker',
-                     [chat.id, new_set.stickers[0].file_id],
+                     [chat.id, first_sticker.file_id],
                      {'reply_markup': keyboard})
 
         if next_task.chat.type == 'private':
@@ -86,7 +190,7 @@ def check_newsfeed_chat(bot, session, chat):
         call_tg_func(bot, 'send_message', [chat.id, message])
 
         chat.current_task = next_task
-        chat.current_sticker = new_set.stickers[0]
+        chat.current_sticker = first_sticker
 
     # A newsfeed chat has been converted to a super group or the bot has been kicked. Delete it anyway
     except ChatMigrated:
@@ -107,30 +211,23 @@ def distribute_tasks(bot, session):
         .filter(Chat.current_task_id.is_(None)) \
         .all()
 
-    for chat in idle_maintenance_chats:
-        try:
-            tg_chat = call_tg_func(bot, 'get_chat', args=[chat.id])
-        except BadRequest as e:
-            if e.message == 'Chat not found': # noqa
-                session.delete(chat)
-                continue
+    # Don't bother telegram, if there is nothing to distribute
+    if len(idle_maintenance_chats) == 0 or \
+            not has_open_tasks(session, MAINTENANCE_TASK_TYPES):
+        return
 
-            raise e
+    for chat in idle_maintenance_chats:
+        tg_chat = get_live_chat(bot, chat.id)
+        if tg_chat is None:
+            session.delete(chat)
+            continue
 
         check_maintenance_chat(session, tg_chat, chat, job=True)
 
 
 def check_maintenance_chat(session, tg_chat, chat, job=False):
     """Get the next task and send it to the maintenance channel."""
-    task = session.query(Task) \
-        .filter(Task.reviewed.is_(False)) \
-        .filter(Task.type.in_([
-            Task.CHECK_USER_TAGS,
-            Task.REPORT,
-        ])) \
-        .order_by(Task.created_at.asc()) \
-        .limit(1) \
-        .one_or_none()
+    task = claim_next_task(session, MAINTENANCE_TASK_TYPES)
 
     if task is None:
         chat.current_task = None
@@ -146,8 +243,42 @@ def check_maintenance_chat(session, tg_chat, chat, job=False):
 
     chat.current_task = task
 
+    try:
+        send_maintenance_task(session, tg_chat, task)
+
+    # The maintenance chat has been converted to a super group or the bot has been kicked.
+    # Delete the chat and release the task for the other chats.
+    except (ChatMigrated, Unauthorized):
+        delete_dead_chat(session, chat)
+        return
+    except BadRequest as e:
+        if e.message == 'Chat not found': # noqa
+            delete_dead_chat(session, chat)
+            return
+
+        raise e
+
+    return True
+
+
+def delete_dead_chat(session, chat):
+    """Delete a chat, which can't be reached anymore."""
+    forget_live_chat(chat.id)
+    chat.current_task = None
+    session.delete(chat)
+
+
+def send_maintenance_task(session, tg_chat, task):
+    """Send the text and the keyboard of a maintenance task to a chat."""
     if task.type == Task.CHECK_USER_TAGS:
-        changes = task.changes_to_check
+        changes = session.query(Change) \
+            .filter(Change.check_task_id == task.id) \
+            .options(
+                selectinload(Change.added_tags),
+                selectinload(Change.removed_tags),
+            ) \
+            .order_by(Change.created_at.desc()) \
+            .all()
 
         # Compile task text
         text = [f'User {task.user.username} ({task.user.id}) tagged {len(changes)} sticker']
@@ -169,7 +300,8 @@ def check_maintenance_chat(session, tg_chat, chat, job=False):
         keyboard = get_report_keyboard(task)
 
         # Send first sticker of the set
-        call_tg_func(tg_chat, 'send_sticker', args=[task.sticker_set.stickers[0].file_id])
+        if len(task.sticker_set.preview_file_ids) > 0:
+            call_tg_func(tg_chat, 'send_sticker', args=[task.sticker_set.preview_file_ids[0]])
 
     text_chunks = split_text(text)
     while len(text_chunks) > 0:
@@ -183,62 +315,120 @@ def check_maintenance_chat(session, tg_chat, chat, job=False):
             call_tg_func(tg_chat, 'send_message', args=[chunk],
                          kwargs={'reply_markup': keyboard})
 
-    return True
-
 
 def change_language_of_task_changes(session, task):
     """Change the default language of all tags and changes of this task."""
-    # Sort all changes by sticker. The changes are sorted by created_at.desc()
-    changes_by_sticker = {}
-    for change in task.changes_to_check:
-        file_id = change.sticker.file_id
-        if file_id not in changes_by_sticker:
-            changes_by_sticker[file_id] = []
-        changes_by_sticker[file_id].append(change)
-
-    for _, changes in changes_by_sticker.items():
-        for change in changes:
-            # Change the language of the added tags.
-            for tag in change.added_tags:
-                if not tag.emoji:
-                    tag.is_default_language = not task.is_default_language
-
-            # Change the language for the change
-            change.is_default_language = not task.is_default_language
+    is_default_language = not task.is_default_language
+    task_changes = session.query(Change.id) \
+        .filter(Change.check_task_id == task.id) \
+        .subquery()
+
+    # Change the language of the added tags.
+    added_tags = select([change_added_tags.c.tag_name]) \
+        .where(change_added_tags.c.change_id.in_(task_changes))
+    session.query(Tag) \
+        .filter(Tag.name.in_(added_tags)) \
+        .filter(Tag.emoji.is_(False)) \
+        .update({'is_default_language': is_default_language}, synchronize_session=False)
+
+    # Change the language for the changes
+    session.query(Change) \
+        .filter(Change.check_task_id == task.id) \
+        .update({'is_default_language': is_default_language}, synchronize_session=False)
+
+    # Restore removed tags
+    removed_tags = select([Change.sticker_file_id, change_removed_tags.c.tag_name]) \
+        .select_from(Change.__table__.join(change_removed_tags, change_removed_tags.c.change_id == Change.id)) \
+        .where(Change.check_task_id == task.id) \
+        .distinct()
+    restored = session.execute(insert(sticker_tag)
+                               .from_select(['sticker_file_id', 'tag_name'], removed_tags)
+                               .on_conflict_do_nothing()
+                               .returning(sticker_tag.c.tag_name)).fetchall()
+    Tag.count_stickers(session, Counter(tag_name for (tag_name, ) in restored))
+
+    task.is_default_language = is_default_language
 
-            # Restore removed tags
-            for tag in change.removed_tags:
-                if tag not in change.sticker.tags:
-                    change.sticker.tags.append(tag)
+    session.commit()
 
-            session.commit()
 
-    task.is_default_language = not task.is_default_language
+def get_net_tag_changes(session, user, reverted, oldest_first):
+    """Get the last effective tag change of a user for each touched sticker and tag.
+
+    Returns (sticker_file_id, tag_name, added) tuples. Only the first change per
+    sticker and tag in the given order is returned, since it determines the final
+    state when replaying the changes one by one in the opposite order.
+    """
+    def tag_changes(tag_table, added):
+        return select([
+            Change.sticker_file_id,
+            tag_table.c.tag_name,
+            Change.created_at,
+            Change.id,
+            literal(added).label('added'),
+        ]) \
+            .select_from(Change.__table__.join(tag_table, tag_table.c.change_id == Change.id)) \
+            .where(Change.user_id == user.id) \
+            .where(Change.reverted.is_(reverted))
+
+    tag_change = union_all(
+        tag_changes(change_added_tags, True),
+        tag_changes(change_removed_tags, False),
+    ).alias('tag_change')
+
+    if oldest_first:
+        order = [tag_change.c.created_at.asc(), tag_change.c.id.asc()]
+    else:
+        order = [tag_change.c.created_at.desc(), tag_change.c.id.desc()]
+
+    query = select([tag_change.c.sticker_file_id, tag_change.c.tag_name, tag_change.c.added]) \
+        .distinct(tag_change.c.sticker_file_id, tag_change.c.tag_name) \
+        .order_by(tag_change.c.sticker_file_id, tag_change.c.tag_name, *order)
+
+    return session.execute(query).fetchall()
+
+
+def apply_sticker_tag_changes(session, to_remove, to_add):
+    """Remove and add (sticker_file_id, tag_name) pairs in batches.
+
+    Only pairs, which have actually been removed or added, change the sticker counts of the tags.
+    """
+    sticker_counts = Counter()
+    for i in range(0, len(to_remove), REVERT_BATCH_SIZE):
+        chunk = to_remove[i:i + REVERT_BATCH_SIZE]
+        removed = session.execute(sticker_tag.delete()
+                                  .where(tuple_(sticker_tag.c.sticker_file_id, sticker_tag.c.tag_name).in_(chunk))
+                                  .returning(sticker_tag.c.tag_name)).fetchall()
+        sticker_counts.subtract(tag_name for (tag_name, ) in removed)
+
+    for i in range(0, len(to_add), REVERT_BATCH_SIZE):
+        values = [{'sticker_file_id': file_id, 'tag_name': tag_name}
+                  for file_id, tag_name in to_add[i:i + REVERT_BATCH_SIZE]]
+        added = session.execute(insert(sticker_tag)
+                                .values(values)
+                                .on_conflict_do_nothing()
+                                .returning(sticker_tag.c.tag_name)).fetchall()
+        sticker_counts.update(tag_name for (tag_name, ) in added)
+
+    Tag.count_stickers(session, sticker_counts)
 
 
 def revert_user_changes(session, user):
-    """Revert all changes of a user."""
-    # Get all affected changes with their respective sticker
-    changes = session.query(Change) \
-        .filter(Change.user == user) \
+    """Revert all changes of a user.
+
+    The oldest change of a sticker's tag determines whether the tag existed before the user touched it.
+    """
+    tag_changes = get_net_tag_changes(session, user, False, oldest_first=True)
+    apply_sticker_tag_changes(
+        session,
+        [(file_id, tag_name) for file_id, tag_name, added in tag_changes if added],
+        [(file_id, tag_name) for file_id, tag_name, added in tag_changes if not added],
+    )
+
+    session.query(Change) \
+        .filter(Change.user_id == user.id) \
         .filter(Change.reverted.is_(False)) \
-        .order_by(Change.created_at.desc()) \
-        .all()
-
-    for change in changes:
-        sticker = change.sticker
-
-        # Add tags again
-        for tag in change.added_tags:
-            if tag in sticker.tags:
-                sticker.tags.remove(tag)
-
-        # Removed tags again
-        for tag in change.removed_tags:
-            if tag not in sticker.tags:
-                sticker.tags.append(tag)
-
-        change.reverted = True
+        .update({'reverted': True}, synchronize_session=False)
 
     user.reverted = True
 
@@ -246,27 +436,54 @@ def revert_user_changes(session, user):
 
 
 def undo_user_changes_revert(session, user):
-    """Undo the revert of all changes of a user."""
-    changes = session.query(Change) \
-        .filter(Change.user == user) \
+    """Undo the revert of all changes of a user.
+
+    The newest change of a sticker's tag determines whether the tag exists after replaying all changes.
+    """
+    tag_changes = get_net_tag_changes(session, user, True, oldest_first=False)
+    apply_sticker_tag_changes(
+        session,
+        [(file_id, tag_name) for file_id, tag_name, added in tag_changes if not added],
+        [(file_id, tag_name) for file_id, tag_name, added in tag_changes if added],
+    )
+
+    session.query(Change) \
+        .filter(Change.user_id == user.id) \
         .filter(Change.reverted.is_(True)) \
-        .all()
-
-    for change in changes:
-        sticker = change.sticker
-
-        # Remove added tags
-        for tag in change.added_tags:
-            if tag not in sticker.tags:
-                sticker.tags.append(tag)
-
-        # Add removed tags again
-        for tag in change.removed_tags:
-            if tag in sticker.tags:
-                sticker.tags.remove(tag)
-
-        change.reverted = False
+        .update({'reverted': False}, synchronize_session=False)
 
     user.reverted = False
 
     session.commit()
+
+
+def refresh_tag_sticker_counts(session):
+    """Recompute the denormalized sticker counts of all tags."""
+    sticker_count = session.query(func.count(sticker_tag.c.sticker_file_id)) \
+        .filter(sticker_tag.c.tag_name == Tag.name) \
+        .correlate(Tag) \
+        .as_scalar()
+
+    session.query(Tag).update({Tag.sticker_count: sticker_count}, synchronize_session=False)
+
+
+def refresh_user_change_counters(session):
+    """Recompute the denormalized change counters of all users."""
+    def count_changes(*criteria):
+        return session.query(func.count(Change.id)) \
+            .filter(Change.user_id == User.id) \
+            .filter(*criteria) \
+            .correlate(User) \
+            .as_scalar()
+
+    session.query(User).update({
+        User.change_count: count_changes(),
+        User.unchecked_change_count: count_changes(
+            Change.check_task_id.is_(None),
+            Change.is_default_language.is_(True),
+        ),
+        User.unchecked_international_change_count: count_changes(
+            Change.check_task_id.is_(None),
+            Change.is_default_language.is_(False),
+        ),
+    }, synchronize_session=False)
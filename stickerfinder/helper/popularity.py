@@ -0,0 +1,112 @@
+"""Rollup of the global sticker popularity."""
+import math
+from datetime import datetime, timedelta
+from threading import Lock
+from sqlalchemy import extract, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from stickerfinder.models import InlineQuery, Sticker, StickerPopularity
+
+
+# Time after which a chosen or posted sticker counts only half.
+POPULARITY_HALF_LIFE = timedelta(days=7)
+# Stickers, whose popularity decayed below this score, are removed.
+MIN_POPULARITY = 0.01
+
+
+class StickerEventCounter:
+    """Count chosen and posted stickers until the next popularity rollup."""
+
+    def __init__(self):
+        """Create an empty counter."""
+        self.lock = Lock()
+        self.counts = {}
+
+    def add(self, file_id, amount=1):
+        """Count a chosen or posted sticker."""
+        with self.lock:
+            self.counts[file_id] = self.counts.get(file_id, 0) + amount
+
+    def take(self):
+        """Take all counted stickers."""
+        with self.lock:
+            counts, self.counts = self.counts, {}
+
+        return counts
+
+    def restore(self, counts):
+        """Put counts back, which couldn't be written."""
+        for file_id, amount in counts.items():
+            self.add(file_id, amount)
+
+
+sticker_events = StickerEventCounter()
+
+
+def decay(age):
+    """Get the weight of an event of this age."""
+    return func.exp(-math.log(2) * extract('epoch', age) / POPULARITY_HALF_LIFE.total_seconds())
+
+
+def refresh_popularity(session):
+    """Decay all popularity scores and add the stickers counted since the last rollup."""
+    counts = sticker_events.take()
+    try:
+        rollup_popularity(session, counts)
+        session.commit()
+    except BaseException:
+        session.rollback()
+        sticker_events.restore(counts)
+        raise
+
+
+def rollup_popularity(session, counts):
+    """Update the popularity table with the counted stickers."""
+    # Only a single rollup may decay the scores at a time. Searches can still read the table.
+    session.execute(text('LOCK TABLE sticker_popularity IN SHARE ROW EXCLUSIVE MODE'))
+
+    table = StickerPopularity.__table__
+    if session.query(StickerPopularity.sticker_file_id).first() is None:
+        backfill_popularity(session)
+
+    session.query(StickerPopularity) \
+        .update({
+            StickerPopularity.score: StickerPopularity.score * decay(func.now() - StickerPopularity.updated_at),
+            StickerPopularity.updated_at: func.now(),
+        }, synchronize_session=False)
+
+    session.query(StickerPopularity) \
+        .filter(StickerPopularity.score < MIN_POPULARITY) \
+        .delete(synchronize_session=False)
+
+    # Stickers might have been deleted since they have been counted
+    existing = session.query(Sticker.file_id) \
+        .filter(Sticker.file_id.in_(counts.keys())) \
+        .all()
+    rows = [{
+        'sticker_file_id': file_id,
+        'score': counts[file_id],
+    } for (file_id, ) in sorted(existing)]
+    if len(rows) > 0:
+        statement = insert(table).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=['sticker_file_id'],
+            set_={'score': table.c.score + statement.excluded.score})
+        session.execute(statement)
+
+
+def backfill_popularity(session):
+    """Compute the popularity from the chosen results of recent inline queries."""
+    age = func.now() - InlineQuery.created_at
+    threshold = datetime.now() - POPULARITY_HALF_LIFE * 4
+    chosen = select([
+        InlineQuery.sticker_file_id,
+        func.sum(decay(age)),
+        func.now(),
+    ]) \
+        .where(InlineQuery.sticker_file_id.isnot(None)) \
+        .where(InlineQuery.created_at > threshold) \
+        .group_by(InlineQuery.sticker_file_id)
+
+    session.execute(insert(StickerPopularity.__table__)
+                    .from_select(['sticker_file_id', 'score', 'updated_at'], chosen))
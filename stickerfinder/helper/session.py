@@ -8,7 +8,7 @@ from telegram.error import (
 )
 
 from stickerfinder.config import config
-from stickerfinder.db import get_session
+from stickerfinder.db import get_session, session_scope
 from stickerfinder.sentry import sentry
 from stickerfinder.models import Chat, User
 from stickerfinder.helper import error_text
@@ -21,13 +21,8 @@ def job_session_wrapper(check_ban=False, admin_only=False):
         """Parametrized decorator closure."""
         @wraps(func)
         def wrapper(context):
-            session = get_session()
-            try:
+            with session_scope() as session:
                 func(context, session)
-
-                session.commit()
-            finally:
-                session.close()
         return wrapper
 
     return real_decorator
@@ -58,7 +53,10 @@ def hidden_session_wrapper(check_ban=False, admin_only=False):
 
 def session_wrapper(send_message=True, check_ban=False,
                     admin_only=False, private=False, allow_edit=False):
-    """Create a session, handle permissions, handle exceptions and prepare some entities."""
+    """Create a session, handle permissions, handle exceptions and prepare some entities.
+
+    Only the successful handling of an update is committed.
+    """
     def real_decorator(func):
         """Parametrized decorator closure."""
         @wraps(func)
@@ -88,13 +86,10 @@ def session_wrapper(send_message=True, check_ban=False,
                 if hasattr(update, 'message') and response is not None:
                     call_tg_func(message.chat, 'send_message', args=[response])
 
-            # A user banned the bot
-            except Unauthorized:
-                session.delete(chat)
-
-            # A group chat has been converted to a super group.
-            except ChatMigrated:
-                session.delete(chat)
+            # A user banned the bot or a group chat has been converted to a super group.
+            # The chat is kept, since deleting it would cascade to the changes of its users.
+            except (Unauthorized, ChatMigrated):
+                session.rollback()
 
             # Raise all telegram errors and let the generic error_callback handle it
             except TelegramError as e:
@@ -102,7 +97,7 @@ def session_wrapper(send_message=True, check_ban=False,
 
             except BaseException as e:
                 if send_message:
-                    session.close()
+                    session.rollback()
                     call_tg_func(message.chat, 'send_message',
                                  args=[error_text])
                 raise e
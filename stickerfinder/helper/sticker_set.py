@@ -4,15 +4,21 @@ import re
 import logging
 from PIL import Image
 from pytesseract import image_to_string
+from sqlalchemy import func, tablesample
+from sqlalchemy.orm import aliased
 from telegram.error import BadRequest, TimedOut
 
 from stickerfinder.helper.image import preprocess_image
 from stickerfinder.helper.tag import add_original_emojis
 from stickerfinder.helper.telegram import call_tg_func
-from stickerfinder.models import Sticker
+from stickerfinder.models import Sticker, StickerSet
 from stickerfinder.sentry import sentry
 
 
+# Percentage of the sticker_set table that is sampled when picking a random set.
+RANDOM_SET_SAMPLE_PERCENT = 2
+
+
 def refresh_stickers(session, sticker_set, bot, refresh_ocr=False, chat=None):
     """Refresh stickers and set data from telegram."""
     # Get sticker set from telegram and create new a Sticker for each sticker
@@ -49,6 +55,7 @@ def refresh_stickers(session, sticker_set, bot, refresh_ocr=False, chat=None):
 
     sticker_set.title = tg_sticker_set.title.lower()
     sticker_set.stickers = stickers
+    sticker_set.refresh_sticker_data(session)
     sticker_set.complete = True
     session.commit()
 
@@ -85,3 +92,45 @@ def extract_text(tg_sticker):
         pass
 
     return text
+
+
+def get_random_sticker_set(session):
+    """Get a random sticker set, which can be safely shown to any user.
+
+    Ordering the whole sticker_set table by random() is expensive, so we only
+    sample a few pages of the table and pick a random set from the sample.
+    If the sample doesn't contain a valid set (e.g. small or mostly banned tables),
+    we fall back to the full table.
+    """
+    sampled_set = aliased(StickerSet, tablesample(
+        StickerSet.__table__,
+        func.system(RANDOM_SET_SAMPLE_PERCENT),
+        name='sampled_sticker_set',
+    ))
+
+    sticker_set = random_sticker_set_query(session, sampled_set).one_or_none()
+    if sticker_set is None:
+        sticker_set = random_sticker_set_query(session, StickerSet).one_or_none()
+
+    return sticker_set
+
+
+def random_sticker_set_query(session, sticker_set):
+    """Query a random, non-empty and safe for work sticker set from the given selectable."""
+    return session.query(sticker_set) \
+        .filter(sticker_set.is_default_language.is_(True)) \
+        .filter(sticker_set.nsfw.is_(False)) \
+        .filter(sticker_set.furry.is_(False)) \
+        .filter(sticker_set.banned.is_(False)) \
+        .filter(sticker_set.sticker_count > 0) \
+        .order_by(func.random()) \
+        .limit(1)
+
+
+def get_first_sticker(session, sticker_set):
+    """Get the first sticker of a set, without loading all stickers of the set."""
+    return session.query(Sticker) \
+        .filter(Sticker.sticker_set_name == sticker_set.name) \
+        .order_by(Sticker.file_id.desc()) \
+        .limit(1) \
+        .one_or_none()
@@ -0,0 +1,93 @@
+"""Aggregation of sticker usages, which are written to the database in batches."""
+from threading import Lock
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert
+
+from stickerfinder.models import InlineQuery, Sticker, StickerUsage
+
+
+class UsageAggregator:
+    """Collect chosen inline results in memory and write them with a few statements.
+
+    Usages are counted per (user id, file id) and added to `StickerUsage` with a single upsert,
+    which makes concurrent increments safe. The chosen sticker of each inline query is updated
+    with a single statement as well.
+    """
+
+    def __init__(self):
+        """Create an empty aggregator."""
+        self.lock = Lock()
+        self.usages = {}
+        self.chosen = {}
+
+    def add(self, user_id, file_id, inline_query_id):
+        """Count a chosen sticker of an inline query."""
+        with self.lock:
+            key = (user_id, file_id)
+            self.usages[key] = self.usages.get(key, 0) + 1
+            self.chosen[inline_query_id] = file_id
+
+    def take(self):
+        """Take all pending usages and chosen results."""
+        with self.lock:
+            usages, chosen = self.usages, self.chosen
+            self.usages, self.chosen = {}, {}
+
+        return usages, chosen
+
+    def restore(self, usages, chosen):
+        """Put usages back, which couldn't be written."""
+        with self.lock:
+            for key, amount in usages.items():
+                self.usages[key] = self.usages.get(key, 0) + amount
+            for inline_query_id, file_id in chosen.items():
+                self.chosen.setdefault(inline_query_id, file_id)
+
+    def flush(self, session):
+        """Write all pending usages and commit them."""
+        usages, chosen = self.take()
+        if len(usages) == 0 and len(chosen) == 0:
+            return
+
+        try:
+            write_usages(session, usages, chosen)
+            session.commit()
+        except BaseException:
+            session.rollback()
+            self.restore(usages, chosen)
+            raise
+
+
+def write_usages(session, usages, chosen):
+    """Add usage counts and set the chosen stickers of inline queries."""
+    # Stickers might have been deleted since they have been chosen
+    file_ids = set(file_id for _, file_id in usages.keys()) | set(chosen.values())
+    existing = session.query(Sticker.file_id) \
+        .filter(Sticker.file_id.in_(file_ids)) \
+        .all()
+    existing = set(file_id for (file_id, ) in existing)
+
+    # Rows are sorted, so concurrent flushes lock them in the same order
+    rows = [{
+        'user_id': user_id,
+        'sticker_file_id': file_id,
+        'usage_count': amount,
+    } for (user_id, file_id), amount in sorted(usages.items()) if file_id in existing]
+    if len(rows) > 0:
+        statement = insert(StickerUsage.__table__).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=['sticker_file_id', 'user_id'],
+            set_={
+                'usage_count': StickerUsage.__table__.c.usage_count + statement.excluded.usage_count,
+                'updated_at': func.now(),
+            })
+        session.execute(statement)
+
+    chosen = {inline_query_id: file_id for inline_query_id, file_id in chosen.items() if file_id in existing}
+    if len(chosen) > 0:
+        session.query(InlineQuery) \
+            .filter(InlineQuery.id.in_(chosen.keys())) \
+            .update({InlineQuery.sticker_file_id: case(chosen, value=InlineQuery.id)}, synchronize_session=False)
+
+
+usage_aggregator = UsageAggregator()
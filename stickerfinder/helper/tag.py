@@ -1,11 +1,14 @@
 """Helper functions for tagging."""
+import unicodedata
 from sqlalchemy import func
 from collections import OrderedDict
 
+from stickerfinder.db import read_session_scope
 from stickerfinder.sentry import sentry
 from stickerfinder.helper.telegram import call_tg_func
-from stickerfinder.helper.corrections import ignored_characters
+from stickerfinder.helper.corrections import ignored_characters, emoji_modifiers
 from stickerfinder.helper.tag_mode import TagMode
+from stickerfinder.helper.tag_index import tag_index
 from stickerfinder.helper.keyboard import (
     main_keyboard,
     get_tagging_keyboard,
@@ -69,14 +72,13 @@ def handle_next(session, bot, chat, tg_chat, user):
     # We are tagging a whole sticker set. Skip the current sticker
     if chat.tag_mode == TagMode.STICKER_SET:
         # Check there is a next sticker
-        stickers = chat.current_sticker.sticker_set.stickers
-        for index, sticker in enumerate(stickers):
-            if sticker == chat.current_sticker and index+1 < len(stickers):
-                # We found the next sticker. Send the messages and return
-                chat.current_sticker = stickers[index+1]
-                send_tag_messages(chat, tg_chat, user)
+        next_sticker = get_next_set_sticker(session, chat.current_sticker)
+        if next_sticker is not None:
+            # We found the next sticker. Send the messages and return
+            chat.current_sticker = next_sticker
+            send_tag_messages(chat, tg_chat, user)
 
-                return
+            return
 
         # There are no stickers left, reset the chat and send success message.
         chat.current_sticker.sticker_set.completely_tagged = True
@@ -87,39 +89,65 @@ def handle_next(session, bot, chat, tg_chat, user):
 
     # Find a random sticker with no changes
     elif chat.tag_mode == TagMode.RANDOM:
-        base_query = session.query(Sticker) \
-            .outerjoin(Sticker.changes) \
-            .join(Sticker.sticker_set) \
-            .filter(Change.id.is_(None)) \
-            .filter(StickerSet.is_default_language.is_(True)) \
-            .filter(StickerSet.banned.is_(False)) \
-            .filter(StickerSet.nsfw.is_(False)) \
-            .filter(StickerSet.furry.is_(False)) \
-
-        # Let the users tag the deluxe sticker set first.
-        # If there are no more deluxe sets, just tag another random sticker.
-        sticker = base_query.filter(StickerSet.deluxe.is_(True)) \
-            .order_by(func.random()) \
-            .limit(1) \
-            .one_or_none()
-        if sticker is None:
-            sticker = base_query \
-                .order_by(func.random()) \
-                .limit(1) \
-                .one_or_none()
+        with read_session_scope(session) as read_session:
+            file_id = get_random_untagged_sticker_id(read_session)
 
         # No stickers for tagging left :)
-        if not sticker:
+        if file_id is None:
             call_tg_func(tg_chat, 'send_message',
                          ['It looks like all stickers are already tagged :).'],
                          {'reply_markup': main_keyboard})
             chat.cancel(bot)
+            return
+
+        # Load the sticker from the primary session, since the id may come from a read replica
+        sticker = session.query(Sticker).get(file_id)
 
         # Found a sticker. Send the messages
         chat.current_sticker = sticker
         send_tag_messages(chat, tg_chat, user, send_set_info=True)
 
 
+def get_random_untagged_sticker_id(session):
+    """Get the file_id of a random sticker without any changes, which can be shown to any user."""
+    base_query = session.query(Sticker.file_id) \
+        .outerjoin(Sticker.changes) \
+        .join(Sticker.sticker_set) \
+        .filter(Change.id.is_(None)) \
+        .filter(StickerSet.is_default_language.is_(True)) \
+        .filter(StickerSet.banned.is_(False)) \
+        .filter(StickerSet.nsfw.is_(False)) \
+        .filter(StickerSet.furry.is_(False)) \
+
+    # Let the users tag the deluxe sticker set first.
+    # If there are no more deluxe sets, just tag another random sticker.
+    file_id = base_query.filter(StickerSet.deluxe.is_(True)) \
+        .order_by(func.random()) \
+        .limit(1) \
+        .scalar()
+    if file_id is None:
+        file_id = base_query \
+            .order_by(func.random()) \
+            .limit(1) \
+            .scalar()
+
+    return file_id
+
+
+def get_next_set_sticker(session, sticker):
+    """Get the sticker following this sticker in its set.
+
+    The current sticker of a chat is its position in the set, and stickers are
+    ordered by file_id just like `StickerSet.stickers`.
+    """
+    return session.query(Sticker) \
+        .filter(Sticker.sticker_set_name == sticker.sticker_set_name) \
+        .filter(Sticker.file_id < sticker.file_id) \
+        .order_by(Sticker.file_id.desc()) \
+        .limit(1) \
+        .one_or_none()
+
+
 def initialize_set_tagging(bot, tg_chat, session, name, chat, user):
     """Initialize the set tag functionality of a chat."""
     sticker_set = StickerSet.get_or_create(session, name, chat, user)
@@ -128,7 +156,7 @@ def initialize_set_tagging(bot, tg_chat, session, name, chat, user):
 
     # Chat now expects an incoming tag for the next sticker
     chat.tag_mode = TagMode.STICKER_SET
-    chat.current_sticker = sticker_set.stickers[0]
+    chat.current_sticker = session.query(Sticker).get(sticker_set.preview_file_ids[0])
 
     call_tg_func(tg_chat, 'send_message', [tag_text])
     send_tag_messages(chat, tg_chat, user)
@@ -164,14 +192,44 @@ def get_tags_from_text(text, limit=15):
     return tags[:limit]
 
 
+def get_emojis_from_tags(tags):
+    """Split tags into single emojis.
+
+    Original emojis are stored as single characters, which is why joiners, variation selectors
+    and skin tones are dropped. Returns None, if the tags contain anything but emojis.
+    """
+    emojis = []
+    for tag in tags:
+        for character in tag:
+            if character in emoji_modifiers or '\U0001F3FB' <= character <= '\U0001F3FF':
+                continue
+
+            if unicodedata.category(character) != 'So':
+                return None
+
+            emojis.append(character)
+
+    if len(emojis) == 0:
+        return None
+
+    return list(OrderedDict.fromkeys(emojis))
+
+
+def refresh_tag_index(session):
+    """Reload the tag completion index with the current sticker counts of all tags."""
+    rows = session.query(Tag.name, Tag.is_default_language, Tag.sticker_count) \
+        .filter(Tag.emoji.is_(False)) \
+        .filter(Tag.sticker_count > 0) \
+        .all()
+    sticker_total = session.query(func.count(Sticker.file_id)).scalar()
+
+    tag_index.load(rows, sticker_total)
+
+
 def send_tagged_count_message(session, bot, user, chat):
     """Send a user a message that displays how many stickers he already tagged."""
     if chat.tag_mode in [TagMode.STICKER_SET, TagMode.RANDOM]:
-        count = session.query(Sticker) \
-            .join(Sticker.changes) \
-            .filter(Change.user == user) \
-            .count()
-
+        count = user.change_count
         call_tg_func(bot, 'send_message', [user.id, f'You already tagged {count} stickers. Thanks!'],
                      {'reply_markup': main_keyboard})
 
@@ -197,32 +255,27 @@ def tag_sticker(session, text, sticker, user,
     raw_tags = raw_tags[:10]
 
     # Inform us if the user managed to hit a special count of changes
-    if tg_chat and len(user.changes) in reward_messages:
-        reward = reward_messages[len(user.changes)]
-        call_tg_func(tg_chat, 'send_message', [reward])
-
-        sentry.captureMessage(
-            f'User hit {len(user.changes)} changes!', level='info',
-            extra={
-                'user': user,
-                'changes': len(user.changes),
-            },
-        )
+    if tg_chat:
+        change_count = user.change_count
+        if change_count in reward_messages:
+            reward = reward_messages[change_count]
+            call_tg_func(tg_chat, 'send_message', [reward])
+
+            sentry.captureMessage(
+                f'User hit {change_count} changes!', level='info',
+                extra={
+                    'user': user,
+                    'changes': change_count,
+                },
+            )
 
-    # List of tags that are newly added to this sticker
-    new_tags = []
     # List of all new tags (raw_tags, but with resolved entities)
     # We need this, if we want to replace all tags
-    incoming_tags = []
-
-    # Initialize the new tags array with the tags don't have the current language setting.
-    for raw_tag in raw_tags:
-        incoming_tag = Tag.get_or_create(session, raw_tag, user.is_default_language, False)
-        incoming_tags.append(incoming_tag)
+    incoming_tags = Tag.get_or_create_many(session, raw_tags, user.is_default_language)
 
-        # Add the tag to the list of new tags, if it doesn't exist on this sticker yet
-        if incoming_tag not in sticker.tags:
-            new_tags.append(incoming_tag)
+    # List of tags that are newly added to this sticker
+    current_tags = set(sticker.tags)
+    new_tags = [tag for tag in incoming_tags if tag not in current_tags]
 
     # We got no new tags
     if len(new_tags) == 0:
@@ -237,7 +290,8 @@ def tag_sticker(session, text, sticker, user,
         # Merge the original emojis, since they should always be present on a sticker
         incoming_tags = incoming_tags + sticker.original_emojis
         # Find out, which stickers have been removed
-        removed_tags = [tag for tag in sticker.tags if tag not in incoming_tags]
+        incoming_tag_set = set(incoming_tags)
+        removed_tags = [tag for tag in sticker.tags if tag not in incoming_tag_set]
         sticker.tags = incoming_tags
     else:
         for new_tag in new_tags:
@@ -248,6 +302,11 @@ def tag_sticker(session, text, sticker, user,
                     new_tags, removed_tags,
                     chat=chat, message_id=message_id)
     session.add(change)
+    user.count_change(user.is_default_language)
+
+    sticker_counts = {tag.name: 1 for tag in new_tags}
+    sticker_counts.update({tag.name: -1 for tag in removed_tags})
+    Tag.count_stickers(session, sticker_counts)
 
     session.commit()
 
@@ -261,11 +320,15 @@ def tag_sticker(session, text, sticker, user,
 
 def add_original_emojis(session, sticker, raw_emojis):
     """Add the original emojis to the sticker's tags and to the original_emoji relationship."""
+    sticker_counts = {}
     for raw_emoji in raw_emojis:
         emoji = Tag.get_or_create(session, raw_emoji, True, True)
 
         if emoji not in sticker.tags:
             sticker.tags.append(emoji)
+            sticker_counts[emoji.name] = 1
 
         if emoji not in sticker.original_emojis:
             sticker.original_emojis.append(emoji)
+
+    Tag.count_stickers(session, sticker_counts)
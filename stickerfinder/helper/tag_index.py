@@ -0,0 +1,103 @@
+"""In-memory prefix index over the tag vocabulary for completing partially typed tags."""
+import heapq
+from bisect import bisect_left, insort
+from threading import Lock
+
+
+# Shorter tokens match too many tags to be completed in a meaningful way.
+MIN_PREFIX_LENGTH = 3
+# The amount of completions, which are added for a partially typed tag.
+COMPLETION_LIMIT = 3
+# The score of each matching completion. All completions of a tag together weigh less than an exact match.
+COMPLETION_WEIGHT = 0.3
+
+
+class TagPrefixIndex:
+    """Sorted tag names with the amount of stickers using them.
+
+    All tags starting with a prefix are a contiguous range of the sorted names, which is found by bisection.
+    The index is loaded from the database periodically and new tags are added as they are created.
+    Until it has been loaded, nothing is completed.
+
+    The total amount of stickers is loaded as well, since it's needed to weight tags by their sticker count.
+    """
+
+    def __init__(self):
+        """Create an empty index."""
+        self.lock = Lock()
+        self.clear()
+
+    def clear(self):
+        """Drop all tags."""
+        with self.lock:
+            self.names = []
+            self.tags = {}
+            self.sticker_total = None
+            self.loaded = False
+
+    def load(self, rows, sticker_total):
+        """Replace all tags with (name, is_default_language, sticker_count) rows."""
+        tags = {name: (sticker_count, is_default_language) for name, is_default_language, sticker_count in rows}
+        names = sorted(tags.keys())
+        with self.lock:
+            self.names = names
+            self.tags = tags
+            self.sticker_total = sticker_total
+            self.loaded = True
+
+    def add(self, name, is_default_language):
+        """Add a newly created tag or update the language of an existing one."""
+        with self.lock:
+            if name in self.tags:
+                sticker_count, _ = self.tags[name]
+                self.tags[name] = (sticker_count, is_default_language)
+                return
+
+            # New tags are created to be added to a sticker
+            self.tags[name] = (1, is_default_language)
+            insort(self.names, name)
+
+    def contains(self, name, is_default_language):
+        """Check whether a tag exists in the given language."""
+        with self.lock:
+            tag = self.tags.get(name)
+
+        return tag is not None and (tag[1] or not is_default_language)
+
+    def get_sticker_count(self, name):
+        """Get the amount of stickers with this tag or None, if the index hasn't been loaded yet."""
+        with self.lock:
+            if not self.loaded:
+                return None
+
+            tag = self.tags.get(name)
+
+        return tag[0] if tag is not None else 0
+
+    def complete(self, prefix, is_default_language, limit=COMPLETION_LIMIT):
+        """Get the most used tags starting with a prefix.
+
+        Default language users only get default language tags, just like in the strict search.
+        """
+        if len(prefix) < MIN_PREFIX_LENGTH:
+            return []
+
+        with self.lock:
+            if not self.loaded:
+                return []
+
+            completions = []
+            index = bisect_left(self.names, prefix)
+            while index < len(self.names) and self.names[index].startswith(prefix):
+                name = self.names[index]
+                sticker_count, tag_is_default_language = self.tags[name]
+                if name != prefix and (tag_is_default_language or not is_default_language):
+                    completions.append((sticker_count, name))
+                index += 1
+
+        # The most used tags first, names break ties
+        top = heapq.nsmallest(limit, completions, key=lambda completion: (-completion[0], completion[1]))
+        return [name for _, name in top]
+
+
+tag_index = TagPrefixIndex()
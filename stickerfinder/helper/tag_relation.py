@@ -0,0 +1,69 @@
+"""Precomputation of related tags from their co-occurrence on stickers."""
+from sqlalchemy import and_, func, select, text
+
+from stickerfinder.models import Tag, TagRelation, sticker_tag
+
+
+# Tags need to be used together on this many stickers to be related.
+MIN_COOCCURRENCE = 3
+# The amount of related tags, which are kept for each tag.
+RELATED_TAG_LIMIT = 5
+
+
+def refresh_tag_relations(session):
+    """Recompute all related tags and commit them."""
+    try:
+        build_tag_relations(session)
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+
+
+def build_tag_relations(session):
+    """Replace the related tags with the current co-occurrences of tags.
+
+    Pairs of tags are counted with a self-join of `sticker_tag` on the sticker. Their score is
+    `cooccurrence / sqrt(df(tag) * df(related tag))`, the cosine similarity of the tags' sticker vectors.
+    Emojis are neither related nor expanded.
+    """
+    # Only a single rebuild at a time. Searches can still read the old relations until the commit.
+    session.execute(text('LOCK TABLE tag_relation IN SHARE ROW EXCLUSIVE MODE'))
+
+    sticker_tag_a = sticker_tag.alias('sticker_tag_a')
+    sticker_tag_b = sticker_tag.alias('sticker_tag_b')
+    tag_a = Tag.__table__.alias('tag_a')
+    tag_b = Tag.__table__.alias('tag_b')
+
+    cooccurrence = func.count(sticker_tag_a.c.sticker_file_id)
+    document_frequencies = func.greatest(tag_a.c.sticker_count, 1) * func.greatest(tag_b.c.sticker_count, 1)
+    # The sticker counts might be outdated, which is why the score is capped.
+    score = func.least(cooccurrence / func.sqrt(document_frequencies), 1).label('score')
+    pairs = select([
+        sticker_tag_a.c.tag_name,
+        sticker_tag_b.c.tag_name.label('related_tag_name'),
+        score,
+        func.row_number().over(
+            partition_by=sticker_tag_a.c.tag_name,
+            order_by=[score.desc(), sticker_tag_b.c.tag_name],
+        ).label('rank'),
+    ]) \
+        .select_from(
+            sticker_tag_a
+            .join(sticker_tag_b, and_(sticker_tag_a.c.sticker_file_id == sticker_tag_b.c.sticker_file_id,
+                                      sticker_tag_a.c.tag_name != sticker_tag_b.c.tag_name))
+            .join(tag_a, sticker_tag_a.c.tag_name == tag_a.c.name)
+            .join(tag_b, sticker_tag_b.c.tag_name == tag_b.c.name)
+        ) \
+        .where(tag_a.c.emoji.is_(False)) \
+        .where(tag_b.c.emoji.is_(False)) \
+        .group_by(sticker_tag_a.c.tag_name, sticker_tag_b.c.tag_name, tag_a.c.sticker_count, tag_b.c.sticker_count) \
+        .having(cooccurrence >= MIN_COOCCURRENCE) \
+        .alias('pairs')
+
+    best_pairs = select([pairs.c.tag_name, pairs.c.related_tag_name, pairs.c.score]) \
+        .where(pairs.c.rank <= RELATED_TAG_LIMIT)
+
+    session.query(TagRelation).delete(synchronize_session=False)
+    session.execute(TagRelation.__table__.insert()
+                    .from_select(['tag_name', 'related_tag_name', 'score'], best_pairs))
@@ -0,0 +1,135 @@
+"""Work queue for distributing tasks under newsfeed and maintenance chats."""
+import time
+from threading import Lock
+from sqlalchemy import exists, func
+from telegram.error import BadRequest
+
+from stickerfinder.helper.telegram import call_tg_func
+from stickerfinder.models import Chat, Task
+
+
+# Seconds for which a successful `get_chat` call is trusted, before the chat is requested again.
+CHAT_LIVENESS_TTL = 60 * 60
+
+live_chats = {}
+live_chats_lock = Lock()
+
+
+def open_tasks(session, task_types, *criteria):
+    """Get a query for all unreviewed tasks of the given types, which aren't assigned to any chat."""
+    assigned = exists().where(Chat.current_task_id == Task.id)
+
+    return session.query(Task) \
+        .filter(Task.type.in_(task_types)) \
+        .filter(Task.reviewed.is_(False)) \
+        .filter(~assigned) \
+        .filter(*criteria)
+
+
+def has_open_tasks(session, task_types, *criteria):
+    """Check whether there is any task, which could be claimed."""
+    return session.query(open_tasks(session, task_types, *criteria).exists()).scalar()
+
+
+def claim_next_task(session, task_types, *criteria):
+    """Lock and return the oldest open task of the given types.
+
+    Tasks, which are locked by another transaction, are skipped. The lock is held until
+    the session commits, which should happen after the task has been assigned to a chat.
+    """
+    while True:
+        task = open_tasks(session, task_types, *criteria) \
+            .order_by(Task.created_at.asc()) \
+            .with_for_update(skip_locked=True, of=Task) \
+            .limit(1) \
+            .one_or_none()
+
+        if task is None:
+            return None
+
+        # Another transaction might have assigned and committed this task
+        # after our snapshot has been taken, but before we got the lock.
+        assigned = session.query(Chat.id) \
+            .filter(Chat.current_task_id == task.id) \
+            .first()
+        if assigned is None:
+            return task
+
+
+def get_live_chat(bot, chat_id):
+    """Get the telegram chat for this id or None, if it doesn't exist anymore.
+
+    Results are cached for `CHAT_LIVENESS_TTL` seconds.
+    """
+    now = time.monotonic()
+    with live_chats_lock:
+        cached = live_chats.get(chat_id)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    try:
+        tg_chat = call_tg_func(bot, 'get_chat', args=[chat_id])
+    except BadRequest as e:
+        if e.message == 'Chat not found': # noqa
+            forget_live_chat(chat_id)
+            return None
+
+        raise e
+
+    with live_chats_lock:
+        live_chats[chat_id] = (tg_chat, now + CHAT_LIVENESS_TTL)
+
+    return tg_chat
+
+
+def forget_live_chat(chat_id):
+    """Remove a chat from the liveness cache."""
+    with live_chats_lock:
+        live_chats.pop(chat_id, None)
+
+
+class PendingTaskCounter:
+    """Approximate amount of unreviewed tasks per type.
+
+    Counts are adjusted in memory whenever tasks are created or reviewed
+    and are recounted from the database after `ttl` seconds.
+    """
+
+    def __init__(self, ttl):
+        """Create a new counter."""
+        self.ttl = ttl
+        self.counts = {}
+        self.lock = Lock()
+
+    def get(self, session, task_type):
+        """Get the amount of pending tasks for this type."""
+        now = time.monotonic()
+        with self.lock:
+            cached = self.counts.get(task_type)
+            if cached is not None and cached[1] > now:
+                return cached[0]
+
+        count = session.query(func.count(Task.id)) \
+            .filter(Task.type == task_type) \
+            .filter(Task.reviewed.is_(False)) \
+            .scalar()
+
+        with self.lock:
+            self.counts[task_type] = [count, now + self.ttl]
+
+        return count
+
+    def add(self, task_type, amount=1):
+        """Adjust the cached count of this type."""
+        with self.lock:
+            cached = self.counts.get(task_type)
+            if cached is not None:
+                cached[0] = max(0, cached[0] + amount)
+
+    def clear(self):
+        """Drop all cached counts."""
+        with self.lock:
+            self.counts = {}
+
+
+pending_tasks = PendingTaskCounter(ttl=10 * 60)
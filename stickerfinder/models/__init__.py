@@ -9,3 +9,5 @@ from stickerfinder.models.report import Report # noqa
 from stickerfinder.models.inline_query import InlineQuery # noqa
 from stickerfinder.models.inline_query_request import InlineQueryRequest # noqa
 from stickerfinder.models.sticker_usages import StickerUsage # noqa
+from stickerfinder.models.sticker_popularity import StickerPopularity # noqa
+from stickerfinder.models.tag_relation import TagRelation # noqa
@@ -1,5 +1,6 @@
 """The sqlite model for a inline query request."""
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy import (
     Column,
     func,
@@ -28,6 +29,9 @@ class InlineQueryRequest(base):
     offset = Column(String, nullable=False)
     next_offset = Column(String)
     duration = Column(Interval)
+    # Milliseconds spent in each phase of the search and sampled query plans of slow queries
+    timings = Column(JSONB)
+    query_plans = Column(JSONB)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
 
     inline_query_id = Column(BigInteger, ForeignKey('inline_query.id', ondelete='CASCADE'), index=True)
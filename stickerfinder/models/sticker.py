@@ -60,6 +60,8 @@ class Sticker(base):
     __table_args__ = (
         Index('sticker_text_idx', 'text',
               postgresql_using='gin', postgresql_ops={'text': 'gin_trgm_ops'}),
+        # Walk through the stickers of a set in order
+        Index('sticker_sticker_set_name_file_id_idx', 'sticker_set_name', 'file_id'),
     )
 
     file_id = Column(String, primary_key=True)
@@ -0,0 +1,30 @@
+"""The sqlite model for the popularity of a sticker."""
+from sqlalchemy import (
+    Column,
+    func,
+    ForeignKey,
+)
+from sqlalchemy.types import (
+    DateTime,
+    Float,
+    String,
+)
+
+from stickerfinder.db import base
+
+
+class StickerPopularity(base):
+    """The model for the global popularity of a sticker.
+
+    This is a precomputed, exponentially decayed count of how often a sticker has been chosen or posted.
+    The score has been decayed up to `updated_at`. It is maintained by `refresh_popularity`.
+    """
+
+    __tablename__ = 'sticker_popularity'
+
+    sticker_file_id = Column(String,
+                             ForeignKey('sticker.file_id', ondelete='cascade',
+                                        onupdate='cascade', deferrable=True),
+                             primary_key=True)
+    score = Column(Float, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), nullable=False)
@@ -9,17 +9,23 @@ from sqlalchemy import (
 from sqlalchemy.types import (
     Boolean,
     DateTime,
+    Integer,
     String,
 )
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import ARRAY
 
 from stickerfinder.db import base
-from stickerfinder.models import chat_sticker_set, Task
+from stickerfinder.models import chat_sticker_set, Sticker, Task
+from stickerfinder.helper.task_queue import pending_tasks
 
 
 class StickerSet(base):
     """The sqlite model for a sticker set."""
 
+    # The amount of stickers, which are shown as a preview of the set.
+    PREVIEW_COUNT = 5
+
     __tablename__ = 'sticker_set'
     __table_args__ = (
         Index('sticker_set_name_gin_idx', 'name',
@@ -46,6 +52,10 @@ class StickerSet(base):
     completely_tagged = Column(Boolean, default=False, nullable=False)
     reviewed = Column(Boolean, default=False, nullable=False)
 
+    # Denormalized sticker data, which is maintained by `refresh_sticker_data`
+    sticker_count = Column(Integer, default=0, nullable=False)
+    preview_file_ids = Column(ARRAY(String), default=list, nullable=False)
+
     stickers = relationship("Sticker", order_by="desc(Sticker.file_id)")
     reports = relationship("Report", order_by="desc(Report.created_at)")
     tasks = relationship("Task")
@@ -61,7 +71,20 @@ class StickerSet(base):
 
     def __str__(self):
         """Debug string for class."""
-        return f'StickerSet: {self.title} ({self.name}) \nStickers: {len(self.stickers)}'
+        return f'StickerSet: {self.title} ({self.name}) \nStickers: {self.sticker_count}'
+
+    def refresh_sticker_data(self, session):
+        """Refresh the sticker count and the preview file ids of this set."""
+        self.sticker_count = session.query(func.count(Sticker.file_id)) \
+            .filter(Sticker.sticker_set_name == self.name) \
+            .scalar()
+
+        preview_file_ids = session.query(Sticker.file_id) \
+            .filter(Sticker.sticker_set_name == self.name) \
+            .order_by(Sticker.file_id.desc()) \
+            .limit(StickerSet.PREVIEW_COUNT) \
+            .all()
+        self.preview_file_ids = [file_id for (file_id, ) in preview_file_ids]
 
     @staticmethod
     def get_or_create(session, name, chat, user):
@@ -79,6 +102,7 @@ class StickerSet(base):
             # Error handling: Retry in case somebody sent to stickers at the same time
             try:
                 session.commit()
+                pending_tasks.add(Task.SCAN_SET)
             except IntegrityError as e:
                 session.rollback()
                 sticker_set = session.query(StickerSet).get(name)
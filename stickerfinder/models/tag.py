@@ -1,5 +1,6 @@
 """The sqlite model for a tag."""
 from sqlalchemy import (
+    case,
     Column,
     func,
     Index,
@@ -7,11 +8,14 @@ from sqlalchemy import (
 from sqlalchemy.types import (
     Boolean,
     DateTime,
+    Integer,
     String,
 )
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import insert
 
 from stickerfinder.db import base
+from stickerfinder.helper.tag_index import tag_index
 from stickerfinder.models.sticker import sticker_tag
 
 
@@ -28,6 +32,8 @@ class Tag(base):
     is_default_language = Column(Boolean, default=True, nullable=False)
     emoji = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    # Denormalized amount of stickers with this tag. It can be recomputed with `refresh_tag_sticker_counts`.
+    sticker_count = Column(Integer, server_default='0', default=0, nullable=False)
 
     stickers = relationship(
         "Sticker",
@@ -60,4 +66,54 @@ class Tag(base):
             session.add(tag)
             session.commit()
 
+        tag_index.add(tag.name, tag.is_default_language)
+
         return tag
+
+    @staticmethod
+    def get_or_create_many(session, names, is_default_language, emoji=False):
+        """Get or create multiple tags at once.
+
+        Missing tags are inserted with a single `INSERT ... ON CONFLICT DO NOTHING`,
+        which also handles parallel creation of the same tag.
+        The tags are returned in the same order as the given names.
+        """
+        if len(names) == 0:
+            return []
+
+        values = [{'name': name, 'is_default_language': is_default_language, 'emoji': emoji}
+                  for name in names]
+        session.execute(insert(Tag.__table__)
+                        .values(values)
+                        .on_conflict_do_nothing(index_elements=['name']))
+
+        tags = session.query(Tag).filter(Tag.name.in_(names)).all()
+        for tag in tags:
+            # Make a tag an emoji, if somebody added it as a normal tag before
+            if emoji:
+                tag.emoji = True
+                tag.is_default_language = True
+
+            # If somebody tagged didn't tag in default language, but the thag should be, fix it.
+            if is_default_language and not tag.is_default_language:
+                tag.is_default_language = True
+
+            tag_index.add(tag.name, tag.is_default_language)
+
+        tags_by_name = {tag.name: tag for tag in tags}
+        return [tags_by_name[name] for name in names]
+
+    @staticmethod
+    def count_stickers(session, counts):
+        """Add the amount of added or removed stickers to the sticker count of tags.
+
+        The counts are added inside of the database to prevent lost updates.
+        """
+        counts = {name: count for name, count in counts.items() if count != 0}
+        if len(counts) == 0:
+            return
+
+        session.query(Tag) \
+            .filter(Tag.name.in_(counts.keys())) \
+            .update({Tag.sticker_count: Tag.sticker_count + case(counts, value=Tag.name)},
+                    synchronize_session=False)
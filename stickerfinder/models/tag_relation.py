@@ -0,0 +1,31 @@
+"""The sqlite model for related tags."""
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+)
+from sqlalchemy.types import (
+    Float,
+    String,
+)
+
+from stickerfinder.db import base
+
+
+class TagRelation(base):
+    """The model for a tag, which is often used together with another tag.
+
+    The score is the cosine similarity of both tags' stickers, which is 1 for tags always used together.
+    Only the best related tags of each tag are kept. They are precomputed by `refresh_tag_relations`.
+    """
+
+    __tablename__ = 'tag_relation'
+
+    tag_name = Column(String,
+                      ForeignKey('tag.name', ondelete='cascade',
+                                 onupdate='cascade', deferrable=True),
+                      primary_key=True)
+    related_tag_name = Column(String,
+                              ForeignKey('tag.name', ondelete='cascade',
+                                         onupdate='cascade', deferrable=True),
+                              primary_key=True)
+    score = Column(Float, nullable=False)
@@ -5,6 +5,7 @@ from sqlalchemy import (
     func,
     ForeignKey,
     CheckConstraint,
+    Index,
 )
 from sqlalchemy.types import (
     BigInteger,
@@ -28,6 +29,8 @@ class Task(base):
                          user_id IS NOT NULL) OR type != 'check_user_tags'"),
         CheckConstraint("(type = 'report' AND user_id IS NOT NULL) OR type != 'report'"),
         CheckConstraint("(type = 'scan_set' AND sticker_set_name IS NOT NULL and chat_id IS NOT NULL) OR type != 'report'"),
+        # Used to claim the next open task of a queue
+        Index('ix_task_type_reviewed_created_at', 'type', 'reviewed', 'created_at'),
     )
 
     REPORT = 'report'
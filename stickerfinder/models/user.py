@@ -7,6 +7,7 @@ from sqlalchemy import (
 from sqlalchemy.types import (
     BigInteger,
     DateTime,
+    Integer,
     String,
 )
 from sqlalchemy.exc import IntegrityError
@@ -31,6 +32,11 @@ class User(base):
     authorized = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
 
+    # Denormalized change counters. They can be recomputed with `refresh_user_change_counters`.
+    change_count = Column(Integer, default=0, nullable=False)
+    unchecked_change_count = Column(Integer, default=0, nullable=False, index=True)
+    unchecked_international_change_count = Column(Integer, default=0, nullable=False, index=True)
+
     changes = relationship('Change')
     tasks = relationship('Task')
     reports = relationship('Report')
@@ -63,3 +69,14 @@ class User(base):
             user.username = tg_user.username.lower()
 
         return user
+
+    def count_change(self, is_default_language):
+        """Increment the change counters for a newly created change.
+
+        The counters are incremented inside of the database to prevent lost updates.
+        """
+        self.change_count = User.change_count + 1
+        if is_default_language:
+            self.unchecked_change_count = User.unchecked_change_count + 1
+        else:
+            self.unchecked_international_change_count = User.unchecked_international_change_count + 1
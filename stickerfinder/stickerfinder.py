@@ -35,6 +35,7 @@ from stickerfinder.telegram.commands import (
     stats,
     refresh_sticker_sets,
     refresh_ocr,
+    refresh_counters,
     random_set,
     add_sets,
     delete_set,
@@ -51,6 +52,10 @@ from stickerfinder.telegram.jobs import (
     maintenance_job,
     scan_sticker_sets_job,
     distribute_tasks_job,
+    flush_usage_job,
+    popularity_job,
+    tag_index_job,
+    tag_relation_job,
 )
 from stickerfinder.telegram.message_handlers import (
     handle_private_text,
@@ -138,6 +143,7 @@ if not config.LEECHER:
     # Maintenance Button commands
     dispatcher.add_handler(CommandHandler('refresh', refresh_sticker_sets))
     dispatcher.add_handler(CommandHandler('refresh_ocr', refresh_ocr))
+    dispatcher.add_handler(CommandHandler('refresh_counters', refresh_counters))
     dispatcher.add_handler(CommandHandler('cleanup', cleanup))
     dispatcher.add_handler(CommandHandler('tasks', start_tasks))
     dispatcher.add_handler(CommandHandler('stats', stats))
@@ -151,6 +157,10 @@ if not config.LEECHER:
     job_queue.run_repeating(scan_sticker_sets_job, interval=10, first=0, name='Scan new sticker sets')
     job_queue.run_repeating(distribute_tasks_job, interval=minute, first=minute*2, name='Distribute new tasks')
     job_queue.run_repeating(cleanup_job, interval=hour*2, first=0, name='Perform some database cleanup tasks')
+    job_queue.run_repeating(flush_usage_job, interval=5, first=5, name='Write collected sticker usages')
+    job_queue.run_repeating(popularity_job, interval=hour, first=minute*5, name='Roll up the sticker popularity')
+    job_queue.run_repeating(tag_index_job, interval=hour, first=0, name='Reload the tag completion index')
+    job_queue.run_repeating(tag_relation_job, interval=hour*24, first=minute*10, name='Recompute related tags')
 
     # Create private message handler
     dispatcher.add_handler(
@@ -3,12 +3,13 @@ from telegram.ext import run_async
 
 from stickerfinder.helper.session import hidden_session_wrapper
 from stickerfinder.helper.callback import CallbackType
+from stickerfinder.helper.favorites import favorites
+from stickerfinder.helper.popularity import sticker_events
 from stickerfinder.helper.tag import initialize_set_tagging
+from stickerfinder.helper.sticker_usage import usage_aggregator
 from stickerfinder.models import (
     Chat,
-    InlineQuery,
     Sticker,
-    StickerUsage,
 )
 
 from .report import (
@@ -112,14 +113,17 @@ def handle_chosen_inline_result(bot, update, session, user):
         return
 
     [search_id, file_id] = splitted
-    inline_query = session.query(InlineQuery).get(search_id)
 
     # This happens, if the user clicks on a link in sticker set search.
     sticker = session.query(Sticker).get(file_id)
     if sticker is None:
         return
 
-    inline_query.sticker_file_id = file_id
+    # The usage and the chosen sticker are written in batches by the `flush_usage_job`
+    usage_aggregator.add(user.id, file_id, int(search_id))
+    sticker_events.add(file_id)
 
-    sticker_usage = StickerUsage.get_or_create(session, inline_query.user, sticker)
-    sticker_usage.usage_count += 1
+    # Keep the cached favorites of this user up to date
+    sticker_set = sticker.sticker_set
+    if not sticker.banned and sticker_set is not None and not sticker_set.banned:
+        favorites.record_usage(user.id, sticker_set.nsfw, sticker_set.furry, file_id)
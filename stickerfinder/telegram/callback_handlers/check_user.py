@@ -1,5 +1,6 @@
 """Module for handling user checking task buttons."""
 from stickerfinder.helper.maintenance import check_maintenance_chat
+from stickerfinder.helper.task_queue import pending_tasks
 from stickerfinder.helper.callback import CallbackResult
 from stickerfinder.helper.telegram import call_tg_func
 from stickerfinder.helper.maintenance import (
@@ -46,6 +47,7 @@ def handle_check_user(session, bot, action, query, payload, chat, tg_chat):
     elif CallbackResult(action).name == 'ok':
         if not task.reviewed:
             task.reviewed = True
+            pending_tasks.add(task.type, -1)
             check_maintenance_chat(session, tg_chat, chat)
 
     keyboard = check_user_tags_keyboard(task)
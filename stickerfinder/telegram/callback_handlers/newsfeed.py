@@ -1,6 +1,8 @@
 """Callback query sub-handlers for dealing with newsfeed buttons."""
 from stickerfinder.helper.maintenance import distribute_newsfeed_tasks
+from stickerfinder.helper.task_queue import pending_tasks
 from stickerfinder.helper.callback import CallbackResult
+from stickerfinder.helper.favorites import favorites
 from stickerfinder.helper.telegram import call_tg_func
 from stickerfinder.helper.keyboard import (
     get_nsfw_ban_keyboard,
@@ -18,6 +20,10 @@ def handle_ban_set(session, action, query, payload, chat, tg_chat):
     elif CallbackResult(action).name == 'ok':
         sticker_set.banned = False
 
+    # The set might have become visible or hidden in some favorites
+    session.commit()
+    favorites.clear()
+
     keyboard = get_nsfw_ban_keyboard(sticker_set)
     call_tg_func(query.message, 'edit_reply_markup', [], {'reply_markup': keyboard})
 
@@ -30,6 +36,9 @@ def handle_nsfw_set(session, action, query, payload, chat, tg_chat):
     elif CallbackResult(action).name == 'ok':
         sticker_set.nsfw = False
 
+    session.commit()
+    favorites.clear()
+
     keyboard = get_nsfw_ban_keyboard(sticker_set)
     call_tg_func(query.message, 'edit_reply_markup', [], {'reply_markup': keyboard})
 
@@ -42,6 +51,9 @@ def handle_fur_set(session, action, query, payload, chat, tg_chat):
     elif CallbackResult(action).name == 'ban':
         sticker_set.furry = True
 
+    session.commit()
+    favorites.clear()
+
     keyboard = get_nsfw_ban_keyboard(sticker_set)
     call_tg_func(query.message, 'edit_reply_markup', [], {'reply_markup': keyboard})
 
@@ -79,6 +91,7 @@ def handle_next_newsfeed_set(session, bot, action, query, payload, chat, tg_chat
         .one()
 
     task.reviewed = True
+    pending_tasks.add(task.type, -1)
     sticker_set.reviewed = True
 
     try:
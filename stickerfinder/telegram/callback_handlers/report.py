@@ -1,7 +1,9 @@
 """Module for handling sticker set voting task buttons."""
 from stickerfinder.models import Task
 from stickerfinder.helper.maintenance import check_maintenance_chat
+from stickerfinder.helper.task_queue import pending_tasks
 from stickerfinder.helper.callback import CallbackResult
+from stickerfinder.helper.favorites import favorites
 from stickerfinder.helper.telegram import call_tg_func
 from stickerfinder.helper.keyboard import get_report_keyboard
 
@@ -17,6 +19,7 @@ def handle_report_ban(session, action, query, payload, chat, tg_chat):
         call_tg_func(query, 'answer', ['Set no longer tagged as nsfw'])
 
     session.commit()
+    favorites.clear()
 
     keyboard = get_report_keyboard(task)
     call_tg_func(query.message, 'edit_reply_markup', [], {'reply_markup': keyboard})
@@ -33,6 +36,7 @@ def handle_report_nsfw(session, action, query, payload, chat, tg_chat):
         call_tg_func(query, 'answer', ['Set unbanned'])
 
     session.commit()
+    favorites.clear()
 
     keyboard = get_report_keyboard(task)
     call_tg_func(query.message, 'edit_reply_markup', [], {'reply_markup': keyboard})
@@ -49,6 +53,7 @@ def handle_report_furry(session, action, query, payload, chat, tg_chat):
         call_tg_func(query, 'answer', ['Set tagged as furry'])
 
     session.commit()
+    favorites.clear()
 
     keyboard = get_report_keyboard(task)
     call_tg_func(query.message, 'edit_reply_markup', [], {'reply_markup': keyboard})
@@ -60,6 +65,7 @@ def handle_report_next(session, action, query, payload, chat, tg_chat):
 
     if not task.reviewed:
         task.reviewed = True
+        pending_tasks.add(task.type, -1)
         check_maintenance_chat(session, tg_chat, chat)
 
     try:
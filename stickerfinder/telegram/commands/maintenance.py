@@ -3,11 +3,17 @@ from sqlalchemy import distinct
 from telegram.ext import run_async
 from datetime import datetime, timedelta
 
+from stickerfinder.db import get_pool_status, read_session_scope
 from stickerfinder.helper.sticker_set import refresh_stickers
 from stickerfinder.helper.keyboard import admin_keyboard
 from stickerfinder.helper.session import session_wrapper
 from stickerfinder.helper.telegram import call_tg_func
-from stickerfinder.helper.maintenance import check_maintenance_chat, check_newsfeed_chat
+from stickerfinder.helper.maintenance import (
+    check_maintenance_chat,
+    check_newsfeed_chat,
+    refresh_tag_sticker_counts,
+    refresh_user_change_counters,
+)
 from stickerfinder.helper.cleanup import full_cleanup
 from stickerfinder.models import (
     StickerSet,
@@ -23,6 +29,14 @@ from stickerfinder.models import (
 @session_wrapper(admin_only=True)
 def stats(bot, update, session, chat, user):
     """Send a help text."""
+    with read_session_scope(session) as read_session:
+        stats = get_stats(read_session)
+
+    call_tg_func(update.message.chat, 'send_message', [stats], {'reply_markup': admin_keyboard})
+
+
+def get_stats(session):
+    """Compile the statistics text."""
     # Users
 
     one_month_old = datetime.now() - timedelta(days=30)
@@ -86,7 +100,9 @@ def stats(bot, update, session, chat, user):
         .filter(InlineQuery.created_at > datetime.now() - timedelta(days=1)) \
         .count()
 
-    stats = f"""Users:
+    pool = get_pool_status()
+
+    return f"""Users:
     => last week: {week_user_count}
     => last month: {month_user_count}
     => total: {total_user_count}
@@ -113,8 +129,15 @@ Sticker sets:
 
 Total queries : {total_queries_count}
     => last day: {last_day_queries_count}
+
+Database pool:
+    => checked out: {pool['checked_out']}/{pool['size']}
+    => overflow: {pool['overflow']}/{pool['max_overflow']}
+    => checkouts: {pool['checkouts']}
+    => timeouts: {pool['timeouts']}
+    => average wait: {pool['average_wait']*1000:.1f}ms
+    => max wait: {pool['max_wait']*1000:.1f}ms
 """
-    call_tg_func(update.message.chat, 'send_message', [stats], {'reply_markup': admin_keyboard})
 
 
 @run_async
@@ -160,6 +183,17 @@ def refresh_ocr(bot, update, session, chat, user):
                  ['All sticker sets are refreshed.'], {'reply_markup': admin_keyboard})
 
 
+@run_async
+@session_wrapper(admin_only=True)
+def refresh_counters(bot, update, session, chat, user):
+    """Recompute all denormalized counters."""
+    refresh_user_change_counters(session)
+    refresh_tag_sticker_counts(session)
+
+    call_tg_func(update.message.chat, 'send_message',
+                 ['All counters are refreshed.'], {'reply_markup': admin_keyboard})
+
+
 @run_async
 @session_wrapper(admin_only=True)
 def flag_chat(bot, update, session, chat, user):
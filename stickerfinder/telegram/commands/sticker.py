@@ -1,8 +1,10 @@
 """Sticker related commands."""
 from telegram.ext import run_async
 
+from stickerfinder.helper.favorites import favorites
 from stickerfinder.helper.session import session_wrapper
 from stickerfinder.helper.telegram import call_tg_func
+from stickerfinder.models import Tag
 
 
 @run_async
@@ -32,7 +34,10 @@ def show_sticker_file_id(bot, update, session, chat, user):
 def ban_sticker(bot, update, session, chat, user):
     """Broadcast a message to all users."""
     chat.current_sticker.banned = True
+    Tag.count_stickers(session, {tag.name: -1 for tag in chat.current_sticker.tags})
     chat.current_sticker.tags = []
+    session.commit()
+    favorites.clear()
 
     return 'Sticker banned.'
 
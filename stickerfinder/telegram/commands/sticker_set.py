@@ -1,15 +1,12 @@
 """Sticker set related commands."""
 from telegram.ext import run_async
-from sqlalchemy import func
 
+from stickerfinder.db import read_session_scope
 from stickerfinder.helper.keyboard import main_keyboard
 from stickerfinder.helper.session import session_wrapper
 from stickerfinder.helper.telegram import call_tg_func
-from stickerfinder.models import (
-    Report,
-    StickerSet,
-    Sticker,
-)
+from stickerfinder.helper.sticker_set import get_random_sticker_set
+from stickerfinder.models import Report, Sticker
 
 
 @run_async
@@ -47,21 +44,13 @@ Please send the sticker first before you use /report."""
 @session_wrapper(check_ban=True, private=True)
 def random_set(bot, update, session, chat, user):
     """Get random sticker_set."""
-    sticker_count = func.count(Sticker.file_id).label("sticker_count")
-    sticker_set = session.query(StickerSet)\
-        .join(StickerSet.stickers) \
-        .filter(StickerSet.is_default_language.is_(True)) \
-        .filter(StickerSet.nsfw.is_(False)) \
-        .filter(StickerSet.furry.is_(False)) \
-        .filter(StickerSet.banned.is_(False)) \
-        .group_by(StickerSet) \
-        .having(sticker_count > 0) \
-        .order_by(func.random()) \
-        .limit(1) \
-        .one_or_none()
+    with read_session_scope(session) as read_session:
+        sticker_set = get_random_sticker_set(read_session)
+        file_id = sticker_set.preview_file_ids[0] if sticker_set is not None else None
 
-    if sticker_set is not None:
-        chat.current_sticker = sticker_set.stickers[0]
+    if file_id is not None:
+        # Load the sticker from the primary session, since the set may come from a read replica
+        chat.current_sticker = session.query(Sticker).get(file_id)
         call_tg_func(update.message.chat, 'send_sticker',
-                     args=[sticker_set.stickers[0].file_id],
+                     args=[file_id],
                      kwargs={'reply_markup': main_keyboard})
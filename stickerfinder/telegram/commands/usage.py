@@ -1,5 +1,6 @@
 """Sticker usage statistic specific commands."""
 from telegram.ext import run_async
+from stickerfinder.helper.favorites import favorites
 from stickerfinder.helper.session import session_wrapper
 
 from stickerfinder.models import StickerUsage, Sticker
@@ -26,5 +27,6 @@ def forget_set(bot, update, session, chat, user):
         .filter(StickerUsage.sticker_file_id.in_(usage_file_ids)) \
         .filter(StickerUsage.user == user) \
         .delete(synchronize_session=False)
+    favorites.forget_user(user.id)
 
     return "I forgot all of your usages of this set's sticker."
@@ -4,6 +4,7 @@ from sqlalchemy.exc import IntegrityError
 from telegram.ext import run_async
 from telegram import InlineQueryResultCachedSticker
 
+from stickerfinder.db import read_session_scope
 from stickerfinder.helper.session import hidden_session_wrapper
 from stickerfinder.models import (
     InlineQuery,
@@ -60,8 +61,10 @@ def search(bot, update, session, user):
         session.rollback()
         return
 
-    if context.mode == Context.STICKER_SET_MODE:
-        # Remove keyword tags to prevent wrong results
-        search_sticker_sets(session, update, context, inline_query_request)
-    else:
-        search_stickers(session, update, context, inline_query_request)
+    # The search itself only reads, which is why it can be answered by a read replica
+    with read_session_scope(session) as read_session:
+        if context.mode == Context.STICKER_SET_MODE:
+            # Remove keyword tags to prevent wrong results
+            search_sticker_sets(read_session, update, context, inline_query_request)
+        else:
+            search_stickers(read_session, update, context, inline_query_request)
@@ -1,5 +1,7 @@
 """Object representing a inline query search for easier parameter handling."""
-from stickerfinder.helper.tag import get_tags_from_text
+from stickerfinder.helper.tag import get_emojis_from_tags, get_tags_from_text
+from stickerfinder.helper.tag_index import COMPLETION_WEIGHT, tag_index
+from .timing import SearchTimer
 
 
 class Context():
@@ -8,22 +10,29 @@ class Context():
     STICKER_MODE = 'sticker'
     STICKER_SET_MODE = 'sticker_set'
     FAVORITE_MODE = 'favorite'
+    EMOJI_MODE = 'emoji'
 
     def __init__(self, query, offset_payload, user):
         """Create a new context instance."""
-        self.query = query
-        self.tags = get_tags_from_text(query, limit=10)
-        self.user = user
-        self.mode = Context.STICKER_MODE
-        self.determine_special_search()
+        self.timer = SearchTimer()
+        with self.timer.measure('context'):
+            self.query = query
+            self.tags = get_tags_from_text(query, limit=10)
+            self.user = user
+            self.mode = Context.STICKER_MODE
+            self.completions = []
+            self.determine_special_search()
+            self.complete_trailing_tag()
 
-        self.inline_query_id = None
-        self.offset = None
-        self.fuzzy_offset = None
-        self.extract_info_from_offset(offset_payload)
+            self.inline_query_id = None
+            self.offset = None
+            self.fuzzy_offset = None
+            self.extract_info_from_offset(offset_payload)
 
         self.switched_to_fuzzy = False
         self.limit = None
+        # Weighted (tag, weight) pairs, which are searched in addition to the tags
+        self.related_tags = list(self.completions)
 
     def __str__(self):
         """Debug string for class."""
@@ -66,6 +75,31 @@ class Context():
         # Check whether we should enter favorite mode
         if len(self.tags) == 0:
             self.mode = Context.FAVORITE_MODE
+            return
+
+        # Emoji-only searches are answered by exact emoji lookups
+        if self.mode == Context.STICKER_MODE:
+            emojis = get_emojis_from_tags(self.tags)
+            if emojis is not None:
+                self.mode = Context.EMOJI_MODE
+                self.tags = emojis[:10]
+
+    def complete_trailing_tag(self):
+        """Add the most used completions of a partially typed last tag.
+
+        Inline queries are sent while typing, so the last tag is often incomplete.
+        Its completions can be found by the strict search, which spares us the fuzzy search.
+        They only stand in for the typed tag, which is why they are searched with a reduced weight.
+        """
+        if self.mode not in [Context.STICKER_MODE, Context.STICKER_SET_MODE] or self.query[-1:].isspace():
+            return
+
+        last_tag = self.tags[-1]
+        if tag_index.contains(last_tag, self.user.is_default_language):
+            return
+
+        completions = tag_index.complete(last_tag, self.user.is_default_language)
+        self.completions = [(tag, COMPLETION_WEIGHT) for tag in completions if tag not in self.tags]
 
     def switch_to_fuzzy(self, limit):
         """We didn't get enough strict results and switched to fuzzy search."""
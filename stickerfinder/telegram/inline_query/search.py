@@ -14,8 +14,11 @@ from .offset import (
     get_next_set_offset,
 )
 from .sql_query import (
+    explain,
+    get_emoji_matching_stickers,
     get_favorite_stickers,
     get_fuzzy_matching_stickers,
+    get_related_tags,
     get_strict_matching_stickers,
     get_strict_matching_sticker_sets,
 )
@@ -42,19 +45,23 @@ def search_stickers(session, update, context, inline_query_request):
         pprint.pprint(matching_stickers) # noqa
 
     # Create a result list of max 50 cached sticker objects
-    results = []
-    for file_id in matching_stickers:
-        results.append(InlineQueryResultCachedSticker(
-            f'{context.inline_query_id}:{file_id[0]}', sticker_file_id=file_id[0]))
+    with context.timer.measure('results'):
+        results = []
+        for file_id in matching_stickers:
+            results.append(InlineQueryResultCachedSticker(
+                f'{context.inline_query_id}:{file_id[0]}', sticker_file_id=file_id[0]))
 
-    call_tg_func(update.inline_query, 'answer', args=[results],
-                 kwargs={
-                     'next_offset': next_offset,
-                     'cache_time': 1,
-                     'is_personal': True,
-                     'switch_pm_text': 'Maybe tag some stickers :)?',
-                     'switch_pm_parameter': 'inline',
-                 })
+    with context.timer.measure('answer'):
+        call_tg_func(update.inline_query, 'answer', args=[results],
+                     kwargs={
+                         'next_offset': next_offset,
+                         'cache_time': 1,
+                         'is_personal': True,
+                         'switch_pm_text': 'Maybe tag some stickers :)?',
+                         'switch_pm_parameter': 'inline',
+                     })
+
+    save_timings(session, context, inline_query_request)
 
 
 def search_sticker_sets(session, update, context, inline_query_request):
@@ -76,33 +83,47 @@ def search_sticker_sets(session, update, context, inline_query_request):
         pprint.pprint(matching_sets) # noqa
 
     # Create a result list of max 50 cached sticker objects
-    results = []
-    for sticker_set in matching_sets:
-        sticker_set = sticker_set[0]
-        url = f'https://telegram.me/addstickers/{sticker_set.name}'
-        input_message_content = InputTextMessageContent(url)
-        results.append(InlineQueryResultArticle(
-            f'{context.inline_query_id}:{sticker_set.name}',
-            title=sticker_set.title,
-            description=sticker_set.name,
-            url=url,
-            input_message_content=input_message_content,
-        ))
-
-        for index in range(0, 5):
-            if index < len(sticker_set.stickers):
-                file_id = sticker_set.stickers[index].file_id
+    with context.timer.measure('results'):
+        results = []
+        for name, title, preview_file_ids, _ in matching_sets:
+            url = f'https://telegram.me/addstickers/{name}'
+            input_message_content = InputTextMessageContent(url)
+            results.append(InlineQueryResultArticle(
+                f'{context.inline_query_id}:{name}',
+                title=title,
+                description=name,
+                url=url,
+                input_message_content=input_message_content,
+            ))
+
+            for file_id in preview_file_ids:
                 results.append(InlineQueryResultCachedSticker(
                     f'{context.inline_query_id}:{file_id}', sticker_file_id=file_id))
 
-    call_tg_func(update.inline_query, 'answer', args=[results],
-                 kwargs={
-                     'next_offset': next_offset,
-                     'cache_time': 1,
-                     'is_personal': True,
-                     'switch_pm_text': 'Maybe tag some stickers :)?',
-                     'switch_pm_parameter': 'inline',
-                 })
+    with context.timer.measure('answer'):
+        call_tg_func(update.inline_query, 'answer', args=[results],
+                     kwargs={
+                         'next_offset': next_offset,
+                         'cache_time': 1,
+                         'is_personal': True,
+                         'switch_pm_text': 'Maybe tag some stickers :)?',
+                         'switch_pm_parameter': 'inline',
+                     })
+
+    save_timings(session, context, inline_query_request)
+
+
+def save_timings(session, context, inline_query_request):
+    """Store the phase timings and sampled query plans of this search on the request.
+
+    This is called after answering the inline query, so explaining slow queries doesn't delay the answer.
+    """
+    inline_query_request.timings = dict(context.timer.timings)
+    for phase, (statement, params) in context.timer.samples.items():
+        context.timer.plans[phase] = explain(session.connection(), statement, params)
+
+    if context.timer.plans:
+        inline_query_request.query_plans = dict(context.timer.plans)
 
 
 def get_matching_stickers(session, context):
@@ -115,7 +136,14 @@ def get_matching_stickers(session, context):
     fuzzy_matching_stickers = []
     if context.mode == Context.FAVORITE_MODE:
         matching_stickers = get_favorite_stickers(session, context)
+    elif context.mode == Context.EMOJI_MODE:
+        # Emojis either match exactly or not at all, there's nothing to fuzzy search for
+        matching_stickers = get_emoji_matching_stickers(session, context)
     else:
+        # Rare tags are expanded by related tags, which are searched strictly before falling back to fuzzy search.
+        # This is done for every page, since the fuzzy search excludes the strict candidates of the expanded search.
+        context.related_tags = context.completions + get_related_tags(session, context)
+
         if context.fuzzy_offset is None:
             matching_stickers = get_strict_matching_stickers(session, context)
 
@@ -1,131 +1,483 @@
-"""Query composition for inline search."""
-from sqlalchemy import func, case, cast, Numeric, or_
-
+"""Query composition for inline search.
+
+The search statements only depend on the amount of tags and a few user flags.
+Tags, flags and offsets are passed as bound parameters, which allows us to build and
+compile every statement once and reuse it for all following searches.
+"""
+from threading import Lock
+from sqlalchemy import and_, func, case, cast, exists, literal, select, union, bindparam, BigInteger, Boolean, Float, Integer, Numeric, String, or_
+from sqlalchemy.util import LRUCache
+
+from stickerfinder.config import config
+from stickerfinder.helper.favorites import favorites
+from stickerfinder.helper.tag_index import tag_index
 from stickerfinder.models import (
     Sticker,
+    StickerPopularity,
     StickerSet,
     StickerUsage,
     sticker_tag,
     Tag,
+    TagRelation,
 )
 
 
+# Built statements by (kind, tag count, is_default_language, deluxe[, idf, related tag count][, popularity]).
+# The amount of tags is limited by the inline query context, which keeps this cache small.
+statement_cache = {}
+statement_cache_lock = Lock()
+
+# Compiled statements, which are reused by the connection on execution.
+compiled_cache = LRUCache(500)
+
+# Tags with a lower IDF weight are too common to generate candidates, unless all searched tags are.
+MIN_TAG_WEIGHT = 0.1
+
+# Searches for tags of fewer stickers than this are expanded by related tags.
+EXPANSION_THRESHOLD = 50
+# The amount of related tags, which are added to a search, and the weight of their relation score.
+EXPANSION_LIMIT = 3
+EXPANSION_WEIGHT = 0.3
+
+
+def get_cached_statement(session, key, build):
+    """Get the statement for this key or build and remember it."""
+    with statement_cache_lock:
+        statement = statement_cache.get(key)
+
+    if statement is None:
+        statement = build(session, *key[1:]).statement
+        with statement_cache_lock:
+            statement = statement_cache.setdefault(key, statement)
+
+    return statement
+
+
+def execute_cached(session, context, phase, statement, params):
+    """Execute a cached statement with the compiled statement cache.
+
+    The execution time is recorded as the given phase of the context's timer.
+    Slow statements are only sampled here, they are explained once the user got an answer.
+    """
+    connection = session.connection().execution_options(compiled_cache=compiled_cache)
+
+    with context.timer.measure(phase):
+        result = connection.execute(statement, params).fetchall()
+
+    if context.timer.should_explain(phase):
+        context.timer.samples[phase] = (statement, params)
+
+    return result
+
+
+def explain(connection, statement, params):
+    """Get the output of `EXPLAIN (ANALYZE, BUFFERS)` for this statement."""
+    compiled = statement.compile(dialect=connection.dialect)
+    rows = connection.execute(f'EXPLAIN (ANALYZE, BUFFERS) {compiled}', compiled.construct_params(params))
+
+    return '\n'.join(row[0] for row in rows)
+
+
+def get_search_params(context):
+    """Get the bound parameters for the search statements of this context."""
+    params = {
+        'user_id': context.user.id,
+        'nsfw': context.nsfw,
+        'furry': context.furry,
+        'candidate_limit': config.SEARCH_CANDIDATE_LIMIT,
+        'popularity_weight': config.POPULARITY_WEIGHT,
+        'sticker_total': tag_index.sticker_total,
+    }
+    for i, tag in enumerate(context.tags):
+        params[f'tag_{i}'] = tag
+        params[f'like_{i}'] = f'%{tag}%'
+    for i, (tag, weight) in enumerate(context.related_tags):
+        params[f'related_{i}'] = tag
+        params[f'related_weight_{i}'] = weight
+
+    return params
+
+
+def use_idf_scoring():
+    """Check whether tags should be weighted by their IDF.
+
+    The weights need the total amount of stickers, which is known once the tag index has been loaded.
+    """
+    return config.TAG_IDF_SCORING and tag_index.sticker_total is not None
+
+
+def use_popularity():
+    """Check whether the global sticker popularity is part of the score."""
+    return config.POPULARITY_WEIGHT != 0
+
+
+def materialized(session, cte):
+    """Force a CTE to be computed once.
+
+    PostgreSQL 12 started to inline CTEs, which can only be prevented by `MATERIALIZED`.
+    Older versions don't know the keyword, but always materialize CTEs.
+    """
+    server_version = session.get_bind().dialect.server_version_info
+    if server_version is not None and server_version >= (12,):
+        return cte.prefix_with('MATERIALIZED')
+
+    return cte
+
+
+def get_related_tags(session, context):
+    """Get the best related tags of rarely used searched tags with their weight.
+
+    Related tags are precomputed by `refresh_tag_relations`, so this is a single index lookup.
+    The sticker counts of the tag index decide, whether the searched tags are rare enough.
+    """
+    with context.timer.measure('expansion'):
+        searched_tags = context.tags + [tag for tag, _ in context.completions]
+        sticker_counts = [tag_index.get_sticker_count(tag) for tag in searched_tags]
+        if None in sticker_counts or sum(sticker_counts) >= EXPANSION_THRESHOLD:
+            return []
+
+        score = func.max(TagRelation.score).label('score')
+        related_tags = session.query(TagRelation.related_tag_name, score) \
+            .filter(TagRelation.tag_name.in_(context.tags)) \
+            .filter(TagRelation.related_tag_name.notin_(searched_tags)) \
+            .group_by(TagRelation.related_tag_name) \
+            .order_by(score.desc(), TagRelation.related_tag_name) \
+            .limit(EXPANSION_LIMIT) \
+            .all()
+
+    return [(tag, EXPANSION_WEIGHT * score) for tag, score in related_tags]
+
+
 def get_favorite_stickers(session, context):
-    """Get the most used stickers of a user."""
-    limit = context.limit if context.limit else 50
-    favorite_stickers = session.query(StickerUsage.sticker_file_id, StickerUsage.usage_count) \
-        .join(Sticker) \
-        .join(Sticker.sticker_set) \
-        .filter(StickerUsage.user == context.user) \
-        .filter(Sticker.banned.is_(False)) \
-        .filter(StickerSet.banned.is_(False)) \
-        .filter(StickerSet.nsfw.is_(context.nsfw)) \
-        .filter(StickerSet.furry.is_(context.furry)) \
-        .order_by(StickerUsage.usage_count.desc(), StickerUsage.updated_at.desc()) \
-        .offset(context.offset) \
-        .limit(limit) \
-        .all()
+    """Get the most used stickers of a user.
 
-    return favorite_stickers
+    The first favorites of recently active users are answered from memory.
+    """
+    limit = context.limit if context.limit else 50
+    with context.timer.measure('favorites'):
+        cached = favorites.get(context.user.id, context.nsfw, context.furry, context.offset, limit)
+        if cached is not None:
+            return cached
+
+        # Load all cacheable favorites at once, if the requested page is part of them
+        cacheable = context.offset + limit <= favorites.size
+        favorite_stickers = session.query(StickerUsage.sticker_file_id, StickerUsage.usage_count) \
+            .join(Sticker) \
+            .join(Sticker.sticker_set) \
+            .filter(StickerUsage.user == context.user) \
+            .filter(Sticker.banned.is_(False)) \
+            .filter(StickerSet.banned.is_(False)) \
+            .filter(StickerSet.nsfw.is_(context.nsfw)) \
+            .filter(StickerSet.furry.is_(context.furry)) \
+            .order_by(StickerUsage.usage_count.desc(), StickerUsage.updated_at.desc()) \
+            .offset(0 if cacheable else context.offset) \
+            .limit(favorites.size if cacheable else limit) \
+            .all()
+
+    if not cacheable:
+        return favorite_stickers
+
+    favorites.set(context.user.id, context.nsfw, context.furry, favorite_stickers)
+    return favorite_stickers[context.offset:context.offset + limit]
 
 
 def get_strict_matching_stickers(session, context):
     """Query all strictly matching stickers for given tags."""
-    matching_stickers = get_strict_matching_query(session, context)
+    user = context.user
+    key = ('strict', len(context.tags), user.is_default_language, user.deluxe, use_idf_scoring(),
+           len(context.related_tags), use_popularity())
+    with context.timer.measure('build'):
+        statement = get_cached_statement(session, key, get_strict_matching_statement)
 
-    limit = context.limit if context.limit else 50
-    matching_stickers = matching_stickers.offset(context.offset) \
-        .limit(limit) \
-        .all()
+    params = get_search_params(context)
+    params['offset'] = context.offset
+    params['limit'] = context.limit if context.limit else 50
 
-    return matching_stickers
+    return execute_cached(session, context, 'strict', statement, params)
 
 
 def get_fuzzy_matching_stickers(session, context):
     """Get fuzzy matching stickers."""
-    limit = context.limit if context.limit else 50
-    matching_stickers = get_fuzzy_matching_query(session, context) \
-        .offset(context.fuzzy_offset) \
-        .limit(limit) \
-        .all()
+    user = context.user
+    key = ('fuzzy', len(context.tags), user.is_default_language, user.deluxe, use_idf_scoring(),
+           len(context.related_tags))
+    with context.timer.measure('build'):
+        statement = get_cached_statement(session, key, get_fuzzy_matching_statement)
 
-    return matching_stickers
+    params = get_search_params(context)
+    params['offset'] = context.fuzzy_offset
+    params['limit'] = context.limit if context.limit else 50
+
+    return execute_cached(session, context, 'fuzzy', statement, params)
+
+
+def get_emoji_matching_stickers(session, context):
+    """Get all stickers, which are tagged with the searched emojis."""
+    user = context.user
+    key = ('emoji', len(context.tags), user.is_default_language, user.deluxe, use_popularity())
+    with context.timer.measure('build'):
+        statement = get_cached_statement(session, key, get_emoji_matching_statement)
+
+    params = get_search_params(context)
+    params['offset'] = context.offset
+    params['limit'] = context.limit if context.limit else 50
+
+    return execute_cached(session, context, 'emoji', statement, params)
 
 
 def get_strict_matching_sticker_sets(session, context):
-    """Get all sticker sets by accumulated score for strict search."""
-    strict_subquery = get_strict_matching_query(session, context, sticker_set=True) \
+    """Get all sticker sets by accumulated score for strict search.
+
+    Returns (name, title, preview_file_ids, score) tuples, which is everything needed to display the set.
+    """
+    user = context.user
+    key = ('strict_sets', len(context.tags), user.is_default_language, user.deluxe, use_idf_scoring(),
+           len(context.related_tags), use_popularity())
+    with context.timer.measure('build'):
+        statement = get_cached_statement(session, key, get_strict_matching_sticker_sets_statement)
+
+    params = get_search_params(context)
+    params['offset'] = context.offset
+
+    return execute_cached(session, context, 'sets', statement, params)
+
+
+def get_strict_matching_statement(session, tag_count, is_default_language, deluxe, idf=False, related_count=0,
+                                  popularity=False):
+    """Get the paginated statement for strict tag matching."""
+    return get_strict_matching_query(session, tag_count, is_default_language, deluxe, idf, related_count, popularity) \
+        .offset(bindparam('offset', type_=Integer)) \
+        .limit(bindparam('limit', type_=Integer))
+
+
+def get_fuzzy_matching_statement(session, tag_count, is_default_language, deluxe, idf=False, related_count=0):
+    """Get the paginated statement for fuzzy tag matching."""
+    return get_fuzzy_matching_query(session, tag_count, is_default_language, deluxe, idf, related_count) \
+        .offset(bindparam('offset', type_=Integer)) \
+        .limit(bindparam('limit', type_=Integer))
+
+
+def get_emoji_matching_statement(session, tag_count, is_default_language, deluxe, popularity=False):
+    """Get the paginated statement for emoji matching."""
+    return get_emoji_matching_query(session, tag_count, is_default_language, deluxe, popularity) \
+        .offset(bindparam('offset', type_=Integer)) \
+        .limit(bindparam('limit', type_=Integer))
+
+
+def get_strict_matching_sticker_sets_statement(session, tag_count, is_default_language, deluxe, idf=False, related_count=0,
+                                               popularity=False):
+    """Get the statement for sticker sets, which contain strictly matching stickers.
+
+    Sets are ranked by the accumulated score of their stickers. The name/title score of each set
+    is computed by the per-set stage of the strict query and shared by all stickers of the set.
+    """
+    strict_subquery = get_strict_matching_query(session, tag_count, is_default_language, deluxe, idf, related_count,
+                                                popularity) \
         .subquery('strict_sticker_subq')
 
     score = func.sum(strict_subquery.c.score).label('score')
-    matching_sets = session.query(StickerSet, score) \
-        .join(strict_subquery, StickerSet.name == strict_subquery.c.name) \
-        .group_by(StickerSet) \
-        .order_by(score.desc()) \
+    set_score_subquery = session.query(strict_subquery.c.name, score) \
+        .group_by(strict_subquery.c.name) \
+        .subquery('set_score_subq')
+
+    return session.query(
+        StickerSet.name,
+        StickerSet.title,
+        StickerSet.preview_file_ids,
+        set_score_subquery.c.score,
+    ) \
+        .join(set_score_subquery, StickerSet.name == set_score_subquery.c.name) \
+        .order_by(set_score_subquery.c.score.desc(), StickerSet.name) \
         .limit(8) \
-        .offset(context.offset) \
-        .all()
+        .offset(bindparam('offset', type_=Integer))
+
+
+def get_strict_candidates(session, tag_count, is_default_language, idf=False, related_count=0):
+    """Get the tag scores and the candidates for strict tag matching.
+
+    Candidates are generated with index-backed lookups, so only matching stickers have to be scored.
+    Each lookup can use its own index (tag names, trigram indexes on sticker text and set name/title).
+    Every lookup is capped at `candidate_limit` stickers, which keeps short and very common search terms
+    from pulling in huge parts of the database. The caps are deterministic, which keeps pagination stable.
+
+    Each matching tag scores 1. With `idf`, tags are weighted by their inverse document frequency instead.
+    Related tags are matched like searched tags, but only score with their own, lower weight.
+    """
+    tags = [bindparam(f'tag_{i}', type_=String) for i in range(tag_count)]
+    likes = [bindparam(f'like_{i}', type_=String) for i in range(tag_count)]
+    related = [(bindparam(f'related_{i}', type_=String), bindparam(f'related_weight_{i}', type_=Float))
+               for i in range(related_count)]
+    candidate_limit = bindparam('candidate_limit', type_=Integer)
+
+    # The tag scores are needed for the candidates and for scoring, so they are only queried once.
+    if idf:
+        tag_weights = get_tag_weights(session, tags, is_default_language, related)
+        tag_score = func.sum(tag_weights.c.weight).label('tag_score')
+        tag_subq = session.query(sticker_tag.c.sticker_file_id, tag_score) \
+            .join(tag_weights, sticker_tag.c.tag_name == tag_weights.c.name) \
+            .group_by(sticker_tag.c.sticker_file_id) \
+            .cte('strict_tag_subq')
+    else:
+        if related:
+            weight = case([(sticker_tag.c.tag_name == tag, related_weight) for tag, related_weight in related],
+                          else_=1)
+            tag_score = func.sum(weight).label('tag_score')
+        else:
+            tag_score = func.count(sticker_tag.c.tag_name).label('tag_score')
+        tag_subq = session.query(sticker_tag.c.sticker_file_id, tag_score) \
+            .join(Tag, sticker_tag.c.tag_name == Tag.name) \
+            .filter(or_(Tag.is_default_language == is_default_language,
+                        Tag.is_default_language.is_(True))) \
+            .filter(sticker_tag.c.tag_name.in_(tags + [tag for tag, _ in related])) \
+            .group_by(sticker_tag.c.sticker_file_id) \
+            .cte('strict_tag_subq')
+
+    # Stickers with the most matching tags are preferred
+    tag_candidates = session.query(tag_subq.c.sticker_file_id.label('file_id')) \
+        .order_by(tag_subq.c.tag_score.desc(), tag_subq.c.sticker_file_id) \
+        .limit(candidate_limit) \
+        .subquery('tag_candidates')
+
+    text_candidates = session.query(Sticker.file_id) \
+        .filter(or_(*[Sticker.text.like(like) for like in likes])) \
+        .order_by(Sticker.file_id) \
+        .limit(candidate_limit) \
+        .subquery('text_candidates')
+
+    set_conditions = [StickerSet.name.like(like) for like in likes]
+    set_conditions += [StickerSet.title.like(like) for like in likes]
+    set_candidates = session.query(Sticker.file_id) \
+        .join(Sticker.sticker_set) \
+        .filter(or_(*set_conditions)) \
+        .order_by(Sticker.file_id) \
+        .limit(candidate_limit) \
+        .subquery('set_candidates')
+
+    candidates = union(
+        select([tag_candidates.c.file_id]),
+        select([text_candidates.c.file_id]),
+        select([set_candidates.c.file_id]),
+    ).cte('strict_candidates')
+
+    return tag_subq, candidates
+
+
+def get_tag_weights(session, tags, is_default_language, related):
+    """Get the IDF weight of the searched tags.
+
+    The weight of a tag is `ln(1 + N / df) / ln(1 + N)`, with N being the total amount of stickers
+    and df the amount of stickers with this tag. Unique tags weigh 1, tags of all stickers weigh little, but still match.
+
+    Tags below `MIN_TAG_WEIGHT` are dropped, since their stickers would barely change the ranking,
+    but make up most of the rows, which have to be aggregated. If all searched tags are that common,
+    only the best ones are kept. Related (tag, weight) pairs are weighted by their IDF weight times their own weight,
+    but the threshold only applies to their IDF weight.
+    """
+    sticker_total = func.greatest(cast(bindparam('sticker_total', type_=Float), Float), 1)
+    document_frequency = func.greatest(Tag.sticker_count, 1)
+    idf = func.ln(1 + sticker_total / document_frequency) / func.ln(1 + sticker_total)
+    weight = idf
+    if related:
+        weight = idf * case([(Tag.name == tag, related_weight) for tag, related_weight in related], else_=1)
+    tag_weights = session.query(Tag.name, idf.label('idf'), weight.label('weight')) \
+        .filter(or_(Tag.is_default_language == is_default_language,
+                    Tag.is_default_language.is_(True))) \
+        .filter(Tag.name.in_(tags + [tag for tag, _ in related])) \
+        .cte('strict_tag_weights')
 
-    return matching_sets
+    max_idf = select([func.max(tag_weights.c.idf)]).as_scalar()
+    return session.query(tag_weights.c.name, tag_weights.c.weight) \
+        .filter(tag_weights.c.idf >= func.least(MIN_TAG_WEIGHT, max_idf)) \
+        .subquery('strong_tag_weights')
 
 
-def get_strict_matching_query(session, context, sticker_set=False):
-    """Get the query for strict tag matching."""
-    user = context.user
-    tags = context.tags
-    nsfw = context.nsfw
-    furry = context.furry
-
-    tag_count = func.count(sticker_tag.c.tag_name).label("tag_count")
-    tag_subq = session.query(sticker_tag.c.sticker_file_id, tag_count) \
-        .join(Tag, sticker_tag.c.tag_name == Tag.name) \
-        .filter(or_(Tag.is_default_language == user.is_default_language,
-                    Tag.is_default_language.is_(True))) \
-        .filter(sticker_tag.c.tag_name.in_(tags)) \
-        .group_by(sticker_tag.c.sticker_file_id) \
-        .subquery("tag_subq")
+def get_set_scores(session, tag_count, is_default_language, deluxe, fuzzy=False, sets=None):
+    """Get the name/title score of all visible sticker sets.
+
+    The set score is computed once per set and joined onto the set's stickers,
+    instead of being recomputed for every single sticker of a set.
+    If `sets` is given, only sets whose name is in this selectable are scored.
+    """
+    nsfw = bindparam('nsfw', type_=Boolean)
+    furry = bindparam('furry', type_=Boolean)
 
-    # Condition for matching sticker set names and titles
     set_conditions = []
-    for tag in tags:
-        set_conditions.append(case([
-            (StickerSet.name.like(f'%{tag}%'), 0.75),
-            (StickerSet.title.like(f'%{tag}%'), 0.75),
-        ], else_=0))
+    if fuzzy:
+        threshold = 0.3
+        tags = [bindparam(f'tag_{i}', type_=String) for i in range(tag_count)]
+        for tag in tags:
+            set_conditions.append(case([
+                (func.similarity(StickerSet.name, tag) >= threshold, func.similarity(StickerSet.name, tag)),
+                (func.similarity(StickerSet.title, tag) >= threshold, func.similarity(StickerSet.title, tag)),
+            ], else_=0))
+    else:
+        likes = [bindparam(f'like_{i}', type_=String) for i in range(tag_count)]
+        for like in likes:
+            set_conditions.append(case([
+                (StickerSet.name.like(like), 0.75),
+                (StickerSet.title.like(like), 0.75),
+            ], else_=0))
+
+    set_score = literal(0)
+    for condition in set_conditions:
+        set_score = set_score + condition
+    set_score = set_score.label('set_score')
+
+    set_scores = session.query(StickerSet.name, StickerSet.title, set_score) \
+        .filter(StickerSet.deleted.is_(False)) \
+        .filter(StickerSet.banned.is_(False)) \
+        .filter(StickerSet.reviewed.is_(True)) \
+        .filter(StickerSet.nsfw == nsfw) \
+        .filter(StickerSet.furry == furry)
+
+    # Only query default language sticker sets
+    if is_default_language:
+        set_scores = set_scores.filter(StickerSet.is_default_language.is_(True))
+
+    # Only query deluxe sticker sets
+    if deluxe:
+        set_scores = set_scores.filter(StickerSet.deluxe.is_(True))
+
+    if sets is not None:
+        set_scores = set_scores.filter(StickerSet.name.in_(sets))
+
+    return set_scores.cte('fuzzy_set_scores' if fuzzy else 'strict_set_scores')
+
+
+def get_strict_matching_query(session, tag_count, is_default_language, deluxe, idf=False, related_count=0,
+                              popularity=False):
+    """Get the query for strict tag matching."""
+    likes = [bindparam(f'like_{i}', type_=String) for i in range(tag_count)]
+
+    tag_subq, candidates = get_strict_candidates(session, tag_count, is_default_language, idf, related_count)
+
+    # Only the sets of the candidates need a set score
+    candidate_sets = session.query(Sticker.sticker_set_name) \
+        .join(candidates, Sticker.file_id == candidates.c.file_id)
+    set_scores = get_set_scores(session, tag_count, is_default_language, deluxe, sets=candidate_sets)
 
     # Condition for matching sticker text
     text_conditions = []
-    for tag in tags:
-        text_conditions.append(case([(Sticker.text.like(f'%{tag}%'), 0.40)], else_=0))
+    for like in likes:
+        text_conditions.append(case([(Sticker.text.like(like), 0.40)], else_=0))
 
     # Compute the matching tags score for all stickers
-    score = cast(func.coalesce(tag_subq.c.tag_count, 0), Numeric)
-    for condition in set_conditions + text_conditions:
+    score = cast(func.coalesce(tag_subq.c.tag_score, 0), Numeric) + set_scores.c.set_score
+    for condition in text_conditions:
         score = score + condition
     score = score.label('score')
 
     # Query the whole sticker set in case we actually want to query sticker sets
-    intermediate_query = session.query(Sticker.file_id, StickerSet.name, score)
+    intermediate_query = session.query(Sticker.file_id, set_scores.c.name, score)
 
-    # Compute the score for all stickers and filter nsfw stuff
+    # Compute the score for all candidates. Stickers of hidden sets have no set score and are dropped by the join.
     # We do the score computation in a subquery, since it would otherwise be recomputed for statement.
     intermediate_query = intermediate_query \
+        .select_from(candidates) \
+        .join(Sticker, Sticker.file_id == candidates.c.file_id) \
+        .join(set_scores, Sticker.sticker_set_name == set_scores.c.name) \
         .outerjoin(tag_subq, Sticker.file_id == tag_subq.c.sticker_file_id) \
-        .join(Sticker.sticker_set) \
-        .filter(Sticker.banned.is_(False)) \
-        .filter(StickerSet.deleted.is_(False)) \
-        .filter(StickerSet.banned.is_(False)) \
-        .filter(StickerSet.reviewed.is_(True)) \
-        .filter(StickerSet.nsfw.is_(nsfw)) \
-        .filter(StickerSet.furry.is_(furry))
-
-    # Only query default language
-    if user.is_default_language:
-        intermediate_query = intermediate_query.filter(StickerSet.is_default_language.is_(True))
-
-    # Only query deluxe
-    if user.deluxe:
-        intermediate_query = intermediate_query.filter(StickerSet.deluxe.is_(True))
+        .filter(Sticker.banned.is_(False))
 
     intermediate_query = intermediate_query.subquery('strict_intermediate')
 
@@ -138,28 +490,79 @@ def get_strict_matching_query(session, context, sticker_set=False):
         .filter(or_(intermediate_query.c.score > 0)) \
         .subquery('matching_stickers')
 
+    return get_usage_ranking(session, matching_stickers, popularity)
+
+
+def get_usage_ranking(session, matching_stickers, popularity=False):
+    """Rank matching stickers by their score, the usage of the searching user and their popularity.
+
+    `matching_stickers` needs the columns file_id, name and score.
+    """
     # We got all stickers that are matching to the tags/sticker set names, but now we want to include the usage pattern of the user
-    # into the search. For this purpose we join StickerUsage on all matching stickers and include the count into the score
-    # Afterwards we order by the newly calculated count.
+    # into the search. For this purpose we join the StickerUsage of the searching user on all matching stickers and include the
+    # count into the score. Afterwards we order by the newly calculated count.
+    #
+    # The user is part of the join condition. This makes the join a primary key lookup per sticker and keeps stickers,
+    # which have only been used by other users.
+    #
+    # The precomputed global popularity is added with a logarithmic, configurable weight. It's only joined, if it's weighted.
     #
     # We also order by the name of the set and the file_id to get a deterministic sorting in the search.
     score_with_usage = cast(func.coalesce(StickerUsage.usage_count, 0), Numeric) * 0.25
     score_with_usage = score_with_usage + matching_stickers.c.score
+    if popularity:
+        popularity_weight = bindparam('popularity_weight', type_=Float)
+        popularity_score = popularity_weight * func.ln(1 + func.coalesce(StickerPopularity.score, 0))
+        score_with_usage = score_with_usage + cast(popularity_score, Numeric)
     score_with_usage = score_with_usage.label('score')
+    user_id = bindparam('user_id', type_=BigInteger)
     matching_stickers_with_usage = session.query(matching_stickers.c.file_id, score_with_usage, matching_stickers.c.name) \
-        .outerjoin(StickerUsage, matching_stickers.c.file_id == StickerUsage.sticker_file_id) \
-        .filter(or_(StickerUsage.user_id == user.id, StickerUsage.user_id.is_(None))) \
-        .order_by(score_with_usage.desc(), matching_stickers.c.name, matching_stickers.c.file_id) \
+        .outerjoin(StickerUsage, and_(StickerUsage.sticker_file_id == matching_stickers.c.file_id,
+                                      StickerUsage.user_id == user_id))
+    if popularity:
+        matching_stickers_with_usage = matching_stickers_with_usage \
+            .outerjoin(StickerPopularity, StickerPopularity.sticker_file_id == matching_stickers.c.file_id)
+
+    matching_stickers_with_usage = matching_stickers_with_usage \
+        .order_by(score_with_usage.desc(), matching_stickers.c.name, matching_stickers.c.file_id)
 
     return matching_stickers_with_usage
 
 
-def get_fuzzy_matching_query(session, context):
+def get_emoji_matching_query(session, tag_count, is_default_language, deluxe, popularity=False):
+    """Get the query for emoji matching.
+
+    Emojis are only looked up by the tag name index. Text, set names and titles can't contain
+    meaningful matches for emojis, which is why neither they nor fuzzy matching are considered.
+    """
+    emojis = [bindparam(f'tag_{i}', type_=String) for i in range(tag_count)]
+
+    emoji_count = cast(func.count(sticker_tag.c.tag_name), Numeric).label('score')
+    emoji_subq = session.query(sticker_tag.c.sticker_file_id, emoji_count) \
+        .filter(sticker_tag.c.tag_name.in_(emojis)) \
+        .group_by(sticker_tag.c.sticker_file_id) \
+        .subquery('emoji_subq')
+
+    # Only the visibility of the sets of matching stickers is needed
+    emoji_sets = session.query(Sticker.sticker_set_name) \
+        .join(emoji_subq, Sticker.file_id == emoji_subq.c.sticker_file_id)
+    set_scores = get_set_scores(session, 0, is_default_language, deluxe, sets=emoji_sets)
+
+    matching_stickers = session.query(Sticker.file_id, set_scores.c.name, emoji_subq.c.score) \
+        .select_from(emoji_subq) \
+        .join(Sticker, Sticker.file_id == emoji_subq.c.sticker_file_id) \
+        .join(set_scores, Sticker.sticker_set_name == set_scores.c.name) \
+        .filter(Sticker.banned.is_(False)) \
+        .subquery('matching_stickers')
+
+    return get_usage_ranking(session, matching_stickers, popularity)
+
+
+def get_fuzzy_matching_query(session, tag_count, is_default_language, deluxe, idf=False, related_count=0):
     """Query all fuzzy matching stickers."""
-    user = context.user
-    tags = context.tags
-    nsfw = context.nsfw
-    furry = context.furry
+    tags = [bindparam(f'tag_{i}', type_=String) for i in range(tag_count)]
+    nsfw = bindparam('nsfw', type_=Boolean)
+    furry = bindparam('furry', type_=Boolean)
 
     threshold = 0.3
     # Create a query for each tag, which fuzzy matches all tags and computes the distance
@@ -171,7 +574,7 @@ def get_fuzzy_matching_query(session, context):
         ) \
             .join(Tag, sticker_tag.c.tag_name == Tag.name) \
             .filter(func.similarity(sticker_tag.c.tag_name, tag) >= threshold) \
-            .filter(or_(Tag.is_default_language == user.is_default_language,
+            .filter(or_(Tag.is_default_language == is_default_language,
                         Tag.is_default_language.is_(True)))
         matching_tags.append(tag_query)
 
@@ -190,9 +593,12 @@ def get_fuzzy_matching_query(session, context):
         tag_name_column = matching_tags.c.tag_name.label('tag_name')
 
     # Group all matching tags to get the max score of the best matching searched tag.
+    # The matching tags are materialized, since the planner may otherwise decide to recompute
+    # the similarity of all tags for each sticker.
     fuzzy_subquery = session.query(tag_name_column, func.max(matching_tags.c.tag_similarity).label('tag_similarity')) \
         .group_by(tag_name_column) \
-        .subquery()
+        .cte('fuzzy_tag_subq')
+    fuzzy_subquery = materialized(session, fuzzy_subquery)
 
     # Get all stickers which match a tag, together with the accumulated score of the fuzzy matched tags.
     fuzzy_score = func.sum(fuzzy_subquery.c.tag_similarity).label("fuzzy_score")
@@ -201,13 +607,8 @@ def get_fuzzy_matching_query(session, context):
         .group_by(sticker_tag.c.sticker_file_id) \
         .subquery("tag_subq")
 
-    # Condition for matching sticker set names and titles
-    set_conditions = []
-    for tag in tags:
-        set_conditions.append(case([
-            (func.similarity(StickerSet.name, tag) >= threshold, func.similarity(StickerSet.name, tag)),
-            (func.similarity(StickerSet.title, tag) >= threshold, func.similarity(StickerSet.title, tag)),
-        ], else_=0))
+    # The set names and titles are scored once per set
+    set_scores = get_set_scores(session, tag_count, is_default_language, deluxe, fuzzy=True)
 
     # Condition for matching sticker text
     text_conditions = []
@@ -215,36 +616,22 @@ def get_fuzzy_matching_query(session, context):
         text_conditions.append(case([(func.similarity(Sticker.text, tag) >= threshold, 0.30)], else_=0))
 
     # Compute the whole score
-    score = cast(func.coalesce(tag_subq.c.fuzzy_score, 0), Numeric)
-    for condition in set_conditions + text_conditions:
+    score = cast(func.coalesce(tag_subq.c.fuzzy_score, 0), Numeric) + set_scores.c.set_score
+    for condition in text_conditions:
         score = score + condition
     score = score.label('score')
 
-    # Query all strict matching results to exclude them.
-    strict_subquery = get_strict_matching_query(session, context) \
-        .subquery('strict_subquery')
+    # All strict matching results are strict candidates, which is why excluding those is enough.
+    _, strict_candidates = get_strict_candidates(session, tag_count, is_default_language, idf, related_count)
+    is_strict_candidate = exists().where(strict_candidates.c.file_id == Sticker.file_id)
 
-    # Compute the score for all stickers and filter nsfw stuff
+    # Compute the score for all stickers of visible sets
     # We do the score computation in a subquery, since it would otherwise be recomputed for statement.
-    intermediate_query = session.query(Sticker.file_id, StickerSet.title, score) \
+    intermediate_query = session.query(Sticker.file_id, set_scores.c.title, score) \
+        .join(set_scores, Sticker.sticker_set_name == set_scores.c.name) \
         .outerjoin(tag_subq, Sticker.file_id == tag_subq.c.sticker_file_id) \
-        .outerjoin(strict_subquery, Sticker.file_id == strict_subquery.c.file_id) \
-        .join(Sticker.sticker_set) \
         .filter(Sticker.banned.is_(False)) \
-        .filter(strict_subquery.c.file_id.is_(None)) \
-        .filter(StickerSet.deleted.is_(False)) \
-        .filter(StickerSet.banned.is_(False)) \
-        .filter(StickerSet.reviewed.is_(True)) \
-        .filter(StickerSet.nsfw.is_(nsfw)) \
-        .filter(StickerSet.furry.is_(furry))
-
-    # Only query default language sticker sets
-    if user.is_default_language:
-        intermediate_query = intermediate_query.filter(StickerSet.is_default_language.is_(True))
-
-    # Only query deluxe sticker sets
-    if user.deluxe:
-        intermediate_query = intermediate_query.filter(StickerSet.deluxe.is_(True))
+        .filter(~is_strict_candidate)
 
     intermediate_query = intermediate_query.subquery('fuzzy_intermediate')
 
@@ -0,0 +1,43 @@
+"""Per-phase timing of inline search requests."""
+import time
+import random
+from contextlib import contextmanager
+
+from stickerfinder.config import config
+
+
+class SearchTimer:
+    """Collect the time spent in each phase of a search in milliseconds.
+
+    Phases, which are measured several times, are summed up.
+    Slow queries are sampled into `samples`, if sampling is enabled.
+    Their query plans are collected in `plans` after the user has been answered.
+    """
+
+    def __init__(self):
+        """Create an empty timer."""
+        self.timings = {}
+        self.samples = {}
+        self.plans = {}
+
+    @contextmanager
+    def measure(self, phase):
+        """Measure the wrapped block as the given phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def add(self, phase, seconds):
+        """Add the duration of a phase."""
+        milliseconds = self.timings.get(phase, 0) + seconds * 1000
+        self.timings[phase] = round(milliseconds, 3)
+
+    def should_explain(self, phase):
+        """Check whether the query of this phase should be sampled for explaining."""
+        threshold = config.SEARCH_EXPLAIN_THRESHOLD
+        if threshold is None or phase in self.samples:
+            return False
+
+        return self.timings.get(phase, 0) >= threshold and random.random() < config.SEARCH_EXPLAIN_SAMPLE_RATE
@@ -1,18 +1,24 @@
 """Telegram job tasks."""
 from telegram.ext import run_async
-from sqlalchemy import func, and_
 from datetime import datetime, timedelta
 
-from stickerfinder.config import config
 from stickerfinder.helper.session import job_session_wrapper
 from stickerfinder.helper.sticker_set import refresh_stickers
-from stickerfinder.helper.maintenance import distribute_tasks, distribute_newsfeed_tasks
+from stickerfinder.helper.maintenance import (
+    create_report_tasks,
+    create_user_check_tasks,
+    distribute_tasks,
+    distribute_newsfeed_tasks,
+    mark_reports_inspected,
+    refresh_tag_sticker_counts,
+)
 from stickerfinder.helper.cleanup import full_cleanup
+from stickerfinder.helper.popularity import refresh_popularity
+from stickerfinder.helper.sticker_usage import usage_aggregator
+from stickerfinder.helper.tag import refresh_tag_index
+from stickerfinder.helper.tag_relation import refresh_tag_relations
 from stickerfinder.models import (
-    Change,
     StickerSet,
-    Report,
-    User,
     Task,
 )
 
@@ -35,50 +41,16 @@ def maintenance_job(context, session):
     - Check for stickers to ban (via Report)
     - Check for users to be checked
     """
-    tasks = []
-    # Get all StickerSets with a report and no existing Task
-    report_count = func.count(Report.id).label('report_count')
-    report_candidates = session.query(StickerSet, report_count) \
-        .join(StickerSet.reports) \
-        .outerjoin(Task, and_(
-            StickerSet.name == Task.sticker_set_name,
-            Task.type == Task.REPORT,
-        )) \
-        .filter(Task.id.is_(None)) \
-        .filter(StickerSet.banned.is_(False)) \
-        .group_by(StickerSet) \
-        .having(report_count >= config.REPORT_COUNT) \
-        .all()
-
-    for (sticker_set, _) in report_candidates:
-        task = Task(Task.REPORT, sticker_set=sticker_set)
-        tasks.append(task)
-        session.add(task)
+    tasks, newest_report_id = create_report_tasks(session)
 
     # Get all users which tagged more than the configurated amount of stickers since the last user check.
     for is_default_language in [True, False]:
-        change_count = func.count(Change.id).label('change_count')
-        user_check_candidates = session.query(User, change_count) \
-            .join(User.changes) \
-            .outerjoin(Change.check_task) \
-            .filter(Task.id.is_(None)) \
-            .filter(Change.is_default_language.is_(is_default_language)) \
-            .group_by(User) \
-            .having(change_count >= config.USER_CHECK_COUNT) \
-            .all()
-
-        for (user, _) in user_check_candidates:
-            task = Task(Task.CHECK_USER_TAGS, user=user)
-            task.is_default_language = is_default_language
-            session.add(task)
-            session.commit()
-            session.query(Change) \
-                .filter(Change.check_task_id.is_(None)) \
-                .filter(Change.user_id == user.id) \
-                .filter(Change.is_default_language.is_(is_default_language)) \
-                .update({'check_task_id': task.id}, synchronize_session='fetch')
+        create_user_check_tasks(session, is_default_language)
 
-        session.commit()
+    session.commit()
+
+    # Only skip these reports in the future, once their tasks have been committed.
+    mark_reports_inspected(newest_report_id)
 
 
 @run_async
@@ -118,3 +90,48 @@ def cleanup_job(context, session):
     full_cleanup(session, threshold)
 
     return
+
+
+@run_async
+@job_session_wrapper()
+def popularity_job(context, session):
+    """Decay the global sticker popularity and add recently chosen and posted stickers."""
+    refresh_popularity(session)
+
+    return
+
+
+@run_async
+@job_session_wrapper()
+def tag_index_job(context, session):
+    """Recount the stickers of all tags and reload the tag completion index.
+
+    Tagging keeps the counts up to date, but deleted sets as well as removed
+    and banned stickers are only accounted for here.
+    """
+    refresh_tag_sticker_counts(session)
+    session.commit()
+
+    refresh_tag_index(session)
+
+    return
+
+
+@run_async
+@job_session_wrapper()
+def tag_relation_job(context, session):
+    """Recompute the related tags, which are used to expand searches for rare tags."""
+    refresh_tag_relations(session)
+
+    return
+
+
+@job_session_wrapper()
+def flush_usage_job(context, session):
+    """Write the collected sticker usages to the database.
+
+    This job runs in the job queue thread, which keeps flushes from overlapping.
+    """
+    usage_aggregator.flush(session)
+
+    return
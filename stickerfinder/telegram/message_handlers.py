@@ -5,6 +5,7 @@ from stickerfinder.models import (
     StickerSet,
 )
 from stickerfinder.helper.sticker_set import refresh_stickers
+from stickerfinder.helper.popularity import sticker_events
 from stickerfinder.helper.telegram import call_tg_func
 from stickerfinder.helper.session import session_wrapper
 from stickerfinder.helper.tag_mode import TagMode
@@ -126,6 +127,10 @@ def handle_group_sticker(bot, update, session, chat, user):
     sticker = session.query(Sticker).get(update.message.sticker.file_id)
     chat.current_sticker = sticker
 
+    # Posted stickers count towards the global popularity
+    if sticker is not None:
+        sticker_events.add(sticker.file_id)
+
     if chat.is_maintenance or chat.is_newsfeed:
         message = f'StickerSet "{sticker_set.title}" ({sticker_set.name})'
         keyboard = get_nsfw_ban_keyboard(sticker_set)
@@ -21,6 +21,7 @@ def sticker_set_factory(session, name, stickers=None, tags=None):
         sticker_set.stickers = stickers
 
     session.add(sticker_set)
+    sticker_set.refresh_sticker_data(session)
     session.commit()
 
     return sticker_set
@@ -54,6 +54,9 @@ def strict_inline_search(session):
     for i in range(40, 60):
         sticker = sticker_factory(session, f'sticker_{i}', ['testtag', 'roflcopter'])
         sticker_set_2.stickers.append(sticker)
+
+    sticker_set_1.refresh_sticker_data(session)
+    sticker_set_2.refresh_sticker_data(session)
     session.commit()
 
 #    # Debugg stuff
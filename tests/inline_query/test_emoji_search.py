@@ -0,0 +1,59 @@
+"""Test the search for emojis."""
+import pytest
+
+from stickerfinder.helper.tag import add_original_emojis
+from stickerfinder.models import Sticker, StickerUsage
+from stickerfinder.telegram.inline_query.context import Context
+from stickerfinder.telegram.inline_query.offset import get_next_offset
+from stickerfinder.telegram.inline_query.search import get_matching_stickers
+
+
+@pytest.fixture
+def emoji_stickers(session, strict_inline_search, user):
+    """Add original emojis to a few stickers and use one of them."""
+    for file_id, emojis in [('sticker_00', '😂'), ('sticker_41', '😂🐸'), ('sticker_42', '😂'), ('sticker_43', '🐸')]:
+        add_original_emojis(session, session.query(Sticker).get(file_id), emojis)
+
+    sticker_usage = StickerUsage(user, session.query(Sticker).get('sticker_42'))
+    sticker_usage.usage_count = 2
+    session.add(sticker_usage)
+    session.commit()
+
+
+@pytest.mark.parametrize('query,emojis', [
+    ('😂', ['😂']),
+    ('😂🐸 😂', ['😂', '🐸']),
+    ('👍🏻', ['👍']),
+    ('❤️', ['❤']),
+    ('nsfw 🐸', ['🐸']),
+])
+def test_emoji_context(user, query, emojis):
+    """Queries, which only consist of emojis, are emoji searches."""
+    context = Context(query, '', user)
+    assert context.mode == Context.EMOJI_MODE
+    assert context.tags == emojis
+
+
+@pytest.mark.parametrize('query', ['😂 kermit', '1️⃣', 'set 😂'])
+def test_mixed_emoji_context(user, query):
+    """Emojis with text are searched like any other tag."""
+    context = Context(query, '', user)
+    assert context.mode != Context.EMOJI_MODE
+
+
+def test_emoji_search(session, emoji_stickers, user):
+    """Stickers are ranked by their matching emojis and usage, without any fuzzy search."""
+    context = Context('🐸😂', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+
+    assert [result[0] for result in matching_stickers] == ['sticker_41', 'sticker_42', 'sticker_43', 'sticker_00']
+    assert fuzzy_matching_stickers == []
+    assert 'emoji' in context.timer.timings
+    assert 'fuzzy' not in context.timer.timings
+    assert get_next_offset(context, matching_stickers, fuzzy_matching_stickers) == 'done'
+
+    # Unknown emojis don't match anything
+    context = Context('🦄', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+    assert matching_stickers == []
+    assert fuzzy_matching_stickers == []
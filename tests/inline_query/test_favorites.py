@@ -0,0 +1,103 @@
+"""Test the in-memory cache of favorite stickers."""
+import pytest
+from sqlalchemy import event
+
+from stickerfinder.helper.favorites import FavoriteCache, favorites
+from stickerfinder.models import Sticker, StickerUsage
+from stickerfinder.telegram.inline_query.context import Context
+from stickerfinder.telegram.inline_query.search import get_matching_stickers
+
+
+@pytest.yield_fixture
+def favorite_usages(session, strict_inline_search, user):
+    """Use three stickers a few times."""
+    favorites.clear()
+    for file_id, usage_count in [('sticker_40', 3), ('sticker_00', 2), ('sticker_41', 1)]:
+        sticker_usage = StickerUsage(user, session.query(Sticker).get(file_id))
+        sticker_usage.usage_count = usage_count
+        session.add(sticker_usage)
+    session.commit()
+
+    yield
+
+    favorites.clear()
+
+
+@pytest.yield_fixture
+def statements(connection):
+    """Record all favorite queries sent over the test connection."""
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM sticker_usage' in statement:
+            statements.append(statement)
+
+    event.listen(connection, 'before_cursor_execute', record_statement)
+    yield statements
+    event.remove(connection, 'before_cursor_execute', record_statement)
+
+
+def get_favorites(session, user):
+    """Get the file ids of the favorite search."""
+    context = Context('', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+
+    return [result[0] for result in matching_stickers]
+
+
+def test_warm_favorites_skip_database(session, favorite_usages, user, statements):
+    """Favorites are only queried once."""
+    assert get_favorites(session, user) == ['sticker_40', 'sticker_00', 'sticker_41']
+    assert len(statements) == 1
+
+    assert get_favorites(session, user) == ['sticker_40', 'sticker_00', 'sticker_41']
+    assert len(statements) == 1
+
+
+def test_usage_updates_cached_favorites(session, favorite_usages, user, statements):
+    """Used stickers move up in the cached favorites."""
+    get_favorites(session, user)
+
+    favorites.record_usage(user.id, False, False, 'sticker_41', 3)
+    assert get_favorites(session, user) == ['sticker_41', 'sticker_40', 'sticker_00']
+
+    # The list is complete, so stickers without a cached usage haven't been used before
+    favorites.record_usage(user.id, False, False, 'sticker_42')
+    assert get_favorites(session, user) == ['sticker_41', 'sticker_40', 'sticker_00', 'sticker_42']
+    assert len(statements) == 1
+
+    # Other modes aren't affected
+    favorites.record_usage(user.id, True, False, 'sticker_43')
+    assert favorites.get(user.id, True, False, 0, 50) is None
+
+
+def test_forgotten_favorites_are_reloaded(session, favorite_usages, user, statements):
+    """Forgetting the favorites of a user forces a new query."""
+    get_favorites(session, user)
+
+    favorites.forget_user(user.id)
+    assert get_favorites(session, user) == ['sticker_40', 'sticker_00', 'sticker_41']
+    assert len(statements) == 2
+
+
+def test_incomplete_favorites():
+    """Stickers with an unknown position drop incomplete lists and the least recent users are evicted."""
+    cache = FavoriteCache(max_users=2, size=2)
+    cache.set(1, False, False, [('a', 3), ('b', 2), ('c', 1)])
+
+    # Pages beyond the cached stickers aren't answered
+    assert cache.get(1, False, False, 0, 2) == [('a', 3), ('b', 2)]
+    assert cache.get(1, False, False, 1, 2) is None
+
+    # A sticker with a known count replaces the last favorite
+    cache.record_usage(1, False, False, 'c', 2)
+    assert cache.get(1, False, False, 0, 2) == [('a', 3), ('c', 2)]
+
+    cache.record_usage(1, False, False, 'd')
+    assert cache.get(1, False, False, 0, 2) is None
+
+    cache.set(1, False, False, [])
+    cache.set(2, False, False, [])
+    cache.set(3, False, False, [])
+    assert cache.get(1, False, False, 0, 2) is None
+    assert cache.get(3, False, False, 0, 2) == []
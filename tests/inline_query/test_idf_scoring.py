@@ -0,0 +1,63 @@
+"""Test the IDF weighting of tags in the strict search."""
+import math
+import pytest
+
+from stickerfinder.config import config
+from stickerfinder.helper.maintenance import refresh_tag_sticker_counts
+from stickerfinder.helper.tag import refresh_tag_index
+from stickerfinder.helper.tag_index import tag_index
+from stickerfinder.telegram.inline_query import sql_query
+from stickerfinder.telegram.inline_query.context import Context
+from stickerfinder.telegram.inline_query.search import get_matching_stickers
+
+
+def weight(sticker_count, sticker_total=60):
+    """Compute the expected IDF weight of a tag."""
+    return math.log(1 + sticker_total / sticker_count) / math.log(1 + sticker_total)
+
+
+@pytest.yield_fixture
+def idf_scoring(session, strict_inline_search, monkeypatch):
+    """Enable the IDF scoring with the sticker counts of the strict search stickers."""
+    refresh_tag_sticker_counts(session)
+    refresh_tag_index(session)
+    monkeypatch.setattr(config, 'TAG_IDF_SCORING', True)
+
+    yield
+
+    # Statements with a patched weight threshold mustn't be reused
+    sql_query.statement_cache.clear()
+    tag_index.clear()
+
+
+def test_rare_tags_weigh_more(session, idf_scoring, user):
+    """Rare tags score higher than tags of all stickers."""
+    context = Context('testtag unique_other', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+
+    assert len(matching_stickers) == 50
+    assert matching_stickers[0][0] == 'sticker_00'
+    assert float(matching_stickers[0][1]) == pytest.approx(weight(60) + weight(40))
+    assert ('strict', 2, user.is_default_language, user.deluxe, True, 0, False) in sql_query.statement_cache
+
+    # Tags of all stickers still match
+    context = Context('testtag', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+    assert len(matching_stickers) == 50
+    assert float(matching_stickers[0][1]) == pytest.approx(weight(60))
+
+
+def test_common_tags_are_dropped(session, idf_scoring, user, monkeypatch):
+    """Tags with a weight below the threshold neither generate candidates nor score."""
+    monkeypatch.setattr(sql_query, 'MIN_TAG_WEIGHT', 0.2)
+    sql_query.statement_cache.clear()
+
+    context = Context('testtag roflcopter', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+    assert [result[0] for result in matching_stickers] == [f'sticker_{i}' for i in range(40, 60)]
+    assert float(matching_stickers[0][1]) == pytest.approx(weight(20))
+
+    # The best tags are kept, if all tags are below the threshold
+    context = Context('testtag', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+    assert len(matching_stickers) == 50
@@ -2,9 +2,10 @@
 import pytest
 from tests.factories import sticker_factory
 
-from stickerfinder.models import Tag
+from stickerfinder.config import config
+from stickerfinder.models import Sticker, StickerUsage, Tag
 from stickerfinder.telegram.inline_query.context import Context
-from stickerfinder.telegram.inline_query.search import get_matching_stickers
+from stickerfinder.telegram.inline_query.search import get_matching_stickers, get_matching_sticker_sets
 
 
 @pytest.mark.parametrize('query,first_score, second_score',
@@ -159,3 +160,66 @@ def test_nsfw_search(session, strict_inline_search, user):
     matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
     assert len(matching_stickers) == 1
     assert matching_stickers[0][0] == sticker.file_id
+
+
+def test_strict_sticker_set_search(session, strict_inline_search, user):
+    """Sticker sets are returned by accumulated score together with their previews."""
+    context = Context('set testtag', '', user)
+    matching_sets, duration = get_matching_sticker_sets(session, context)
+
+    assert len(matching_sets) == 2
+    for (name, title, preview_file_ids, score), sticker_set, expected_score \
+            in zip(matching_sets, strict_inline_search, [40, 20]):
+        assert name == sticker_set.name
+        assert score == expected_score
+        assert preview_file_ids == [sticker.file_id for sticker in sticker_set.stickers[:5]]
+
+
+def test_strict_sticker_search_candidate_sources(session, strict_inline_search, user):
+    """Stickers are found by tag, by their text and by their set, but not twice."""
+    sticker = strict_inline_search[0].stickers[0]
+    sticker.text = 'roflcopter in the sky'
+    session.commit()
+
+    context = Context('roflcopter', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+
+    # 20 stickers are tagged with `roflcopter`, one sticker only matches by text.
+    assert len(matching_stickers) == 21
+    assert len(set(result[0] for result in matching_stickers)) == 21
+    assert matching_stickers[-1][0] == sticker.file_id
+    assert float(matching_stickers[-1][1]) == pytest.approx(0.40)
+
+
+def test_strict_sticker_search_candidates_are_capped(session, strict_inline_search, user, monkeypatch):
+    """Only the capped candidates of each lookup are scored and returned."""
+    monkeypatch.setattr(config, 'SEARCH_CANDIDATE_LIMIT', 5)
+
+    # All 60 stickers are tagged with `testtag`. Each of them used to be scored and returned.
+    context = Context('testtag', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+
+    assert [result[0] for result in matching_stickers] == [f'sticker_0{i}' for i in range(5)]
+    # Capped stickers aren't excluded from the fuzzy fallback, since they aren't strict results.
+    assert 'sticker_05' in [result[0] for result in fuzzy_matching_stickers]
+
+
+def test_strict_sticker_search_usage_of_other_users(session, strict_inline_search, user, admin):
+    """Only the usage of the searching user counts and stickers used by others are still found."""
+    other_usage = StickerUsage(admin, session.query(Sticker).get('sticker_40'))
+    other_usage.usage_count = 10
+    own_usage = StickerUsage(user, session.query(Sticker).get('sticker_41'))
+    own_usage.usage_count = 2
+    session.add_all([other_usage, own_usage])
+    session.commit()
+
+    context = Context('roflcopter', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+
+    # The sticker used by the admin used to be dropped from the results.
+    assert len(matching_stickers) == 20
+    assert len(set(result[0] for result in matching_stickers)) == 20
+    assert matching_stickers[0][0] == 'sticker_41'
+    assert float(matching_stickers[0][1]) == pytest.approx(1.5)
+    assert matching_stickers[1][0] == 'sticker_40'
+    assert float(matching_stickers[1][1]) == pytest.approx(1)
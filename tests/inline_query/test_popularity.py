@@ -0,0 +1,71 @@
+"""Test the global sticker popularity."""
+import math
+import pytest
+from datetime import datetime, timedelta
+
+from stickerfinder.config import config
+from stickerfinder.helper.popularity import refresh_popularity, sticker_events
+from stickerfinder.models import InlineQuery, StickerPopularity
+from stickerfinder.telegram.inline_query.context import Context
+from stickerfinder.telegram.inline_query import sql_query
+from stickerfinder.telegram.inline_query.search import get_matching_stickers
+
+
+def get_popularity(session):
+    """Get the popularity scores by file id."""
+    session.expire_all()
+    return {popularity.sticker_file_id: popularity.score for popularity in session.query(StickerPopularity).all()}
+
+
+def test_popularity_rollup(session, strict_inline_search, user):
+    """Chosen stickers are backfilled, counted stickers added and all scores decay."""
+    sticker_events.take()
+    for file_id, age in [('sticker_00', 0), ('sticker_00', 7), ('sticker_01', 14), ('sticker_02', 60)]:
+        inline_query = InlineQuery.get_or_create(session, None, 'testtag', user)
+        inline_query.sticker_file_id = file_id
+        inline_query.created_at = datetime.now() - timedelta(days=age)
+    session.commit()
+
+    refresh_popularity(session)
+    popularity = get_popularity(session)
+    assert set(popularity.keys()) == {'sticker_00', 'sticker_01'}
+    assert popularity['sticker_00'] == pytest.approx(1.5, abs=0.01)
+    assert popularity['sticker_01'] == pytest.approx(0.25, abs=0.01)
+
+    # Counted stickers are added, unknown stickers are ignored
+    sticker_events.add('sticker_01', 2)
+    sticker_events.add('sticker_03')
+    sticker_events.add('unknown_sticker')
+    refresh_popularity(session)
+    popularity = get_popularity(session)
+    assert popularity['sticker_01'] == pytest.approx(2.25, abs=0.01)
+    assert popularity['sticker_03'] == pytest.approx(1, abs=0.01)
+
+    # A week later, everything counts half
+    session.query(StickerPopularity) \
+        .update({StickerPopularity.updated_at: StickerPopularity.updated_at - timedelta(days=7)})
+    refresh_popularity(session)
+    popularity = get_popularity(session)
+    assert popularity['sticker_00'] == pytest.approx(0.75, abs=0.01)
+    assert popularity['sticker_03'] == pytest.approx(0.5, abs=0.01)
+
+
+def test_popularity_ranking(session, strict_inline_search, user, monkeypatch):
+    """Popular stickers are ranked higher, if the popularity weight is set."""
+    session.add(StickerPopularity(sticker_file_id='sticker_45', score=math.e - 1))
+    session.commit()
+
+    context = Context('roflcopter', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+    assert matching_stickers[0][0] == 'sticker_40'
+
+    # The popularity isn't joined, unless it's weighted
+    key = ('strict', 1, user.is_default_language, user.deluxe, False, 0, False)
+    assert 'sticker_popularity' not in str(sql_query.statement_cache[key])
+
+    monkeypatch.setattr(config, 'POPULARITY_WEIGHT', 0.5)
+    context = Context('roflcopter', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+    assert matching_stickers[0][0] == 'sticker_45'
+    assert float(matching_stickers[0][1]) == pytest.approx(1.5)
+    assert float(matching_stickers[1][1]) == pytest.approx(1)
@@ -0,0 +1,81 @@
+"""Test the expansion of searches by related tags."""
+import math
+import pytest
+
+from tests.factories import sticker_factory, sticker_set_factory
+from stickerfinder.config import config
+from stickerfinder.helper.maintenance import refresh_tag_sticker_counts
+from stickerfinder.helper.tag import refresh_tag_index
+from stickerfinder.helper.tag_index import tag_index
+from stickerfinder.helper.tag_relation import refresh_tag_relations
+from stickerfinder.models import TagRelation
+from stickerfinder.telegram.inline_query.context import Context
+from stickerfinder.telegram.inline_query.search import get_matching_stickers
+from stickerfinder.telegram.inline_query.sql_query import EXPANSION_WEIGHT
+
+
+@pytest.yield_fixture
+def related_tags(session, strict_inline_search):
+    """Add a few rare stickers and compute the related tags."""
+    stickers = []
+    for i, tags in enumerate([['kermit', 'frog']] * 3 + [['frog']] * 3 + [['kermit', 'muppet']] * 2):
+        stickers.append(sticker_factory(session, f'rare_{i}', tags))
+    sticker_set_factory(session, 'frogs', stickers)
+
+    refresh_tag_sticker_counts(session)
+    refresh_tag_relations(session)
+    refresh_tag_index(session)
+
+    yield
+
+    tag_index.clear()
+
+
+def test_tag_relations(session, related_tags):
+    """Tags, which are often used together, are related by the cosine similarity of their stickers."""
+    relations = session.query(TagRelation).all()
+    relations = {(relation.tag_name, relation.related_tag_name): relation.score for relation in relations}
+
+    assert relations[('kermit', 'frog')] == pytest.approx(3 / math.sqrt(5 * 6))
+    assert relations[('frog', 'kermit')] == pytest.approx(3 / math.sqrt(5 * 6))
+    assert relations[('testtag', 'unique_other')] == pytest.approx(40 / math.sqrt(60 * 40))
+
+    # Tags, which are rarely used together, aren't related
+    assert ('kermit', 'muppet') not in relations
+
+
+def test_rare_tags_are_expanded(session, related_tags, user):
+    """Stickers with related tags are found by the strict search with a lower score."""
+    context = Context('kermit', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+
+    weight = EXPANSION_WEIGHT * 3 / math.sqrt(5 * 6)
+    assert context.related_tags == [('frog', pytest.approx(weight))]
+
+    scores = {file_id: float(score) for file_id, score, _ in matching_stickers}
+    assert scores == {
+        'rare_0': pytest.approx(1 + weight),
+        'rare_1': pytest.approx(1 + weight),
+        'rare_2': pytest.approx(1 + weight),
+        'rare_6': pytest.approx(1),
+        'rare_7': pytest.approx(1),
+        'rare_3': pytest.approx(weight),
+        'rare_4': pytest.approx(weight),
+        'rare_5': pytest.approx(weight),
+    }
+    assert [result[0] for result in matching_stickers][-3:] == ['rare_3', 'rare_4', 'rare_5']
+
+    # Common tags aren't expanded
+    context = Context('testtag', '', user)
+    get_matching_stickers(session, context)
+    assert context.related_tags == []
+
+
+def test_related_tags_with_idf_scoring(session, related_tags, user, monkeypatch):
+    """Related tags aren't dropped for their low weight in the IDF scoring."""
+    monkeypatch.setattr(config, 'TAG_IDF_SCORING', True)
+
+    context = Context('kermit', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+    assert len(matching_stickers) == 8
+    assert [result[0] for result in matching_stickers][-3:] == ['rare_3', 'rare_4', 'rare_5']
@@ -0,0 +1,25 @@
+"""Test reuse of cached search statements."""
+from stickerfinder.telegram.inline_query import sql_query
+from stickerfinder.telegram.inline_query.context import Context
+from stickerfinder.telegram.inline_query.search import get_matching_stickers
+
+
+def test_statement_reused_for_same_tag_count(session, strict_inline_search, user):
+    """Searches with the same amount of tags share a statement, but not their parameters."""
+    sql_query.statement_cache.clear()
+
+    context = Context('testtag', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+    assert len(matching_stickers) == 50
+    statement = sql_query.statement_cache[('strict', 1, user.is_default_language, user.deluxe, False, 0, False)]
+
+    context = Context('roflcopter', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+    assert len(matching_stickers) == 20
+    assert matching_stickers[0][0] == 'sticker_40'
+    assert sql_query.statement_cache[('strict', 1, user.is_default_language, user.deluxe, False, 0, False)] is statement
+
+    # A different amount of tags results in a new statement
+    context = Context('testtag roflcopter', '', user)
+    get_matching_stickers(session, context)
+    assert ('strict', 2, user.is_default_language, user.deluxe, False, 0, False) in sql_query.statement_cache
@@ -0,0 +1,89 @@
+"""Test the completion of partially typed tags."""
+import pytest
+
+from tests.factories import sticker_factory, sticker_set_factory
+from stickerfinder.helper.maintenance import refresh_tag_sticker_counts
+from stickerfinder.helper.tag import refresh_tag_index
+from stickerfinder.helper.tag_index import COMPLETION_WEIGHT, TagPrefixIndex, tag_index
+from stickerfinder.models import Tag
+from stickerfinder.telegram.inline_query.context import Context
+from stickerfinder.telegram.inline_query.search import get_matching_stickers
+
+
+@pytest.yield_fixture
+def loaded_tag_index(session, strict_inline_search):
+    """Load the tag index from the strict search stickers."""
+    refresh_tag_sticker_counts(session)
+    refresh_tag_index(session)
+
+    yield
+
+    tag_index.clear()
+
+
+def test_prefix_completion():
+    """Completions are ordered by their sticker count and respect the user's language."""
+    index = TagPrefixIndex()
+    index.add('kermit', True)
+    assert index.complete('kerm', True) == []
+
+    index.load([
+        ('kermit', True, 10),
+        ('kermit_the_frog', True, 25),
+        ('kermitfrosch', False, 50),
+        ('kermis', True, 10),
+        ('kerning', True, 100),
+        ('kermitkermit', True, 1),
+    ], 1000)
+    assert index.complete('kerm', True) == ['kermit_the_frog', 'kermis', 'kermit']
+    assert index.complete('kerm', False) == ['kermitfrosch', 'kermit_the_frog', 'kermis']
+    assert index.complete('kermit', True, limit=5) == ['kermit_the_frog', 'kermitkermit']
+    assert index.complete('ke', True) == []
+
+    # New tags can be completed right away
+    index.add('kermes', True)
+    assert index.complete('kerme', True) == ['kermes']
+    assert index.contains('kermes', True)
+    assert not index.contains('kermitfrosch', True)
+
+
+def test_trailing_tag_completion(session, loaded_tag_index, user):
+    """A partially typed last tag is answered by the strict search."""
+    context = Context('testt', '', user)
+    assert context.tags == ['testt']
+    assert context.completions == [('testtag', COMPLETION_WEIGHT)]
+
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+    assert len(matching_stickers) == 50
+    assert fuzzy_matching_stickers == []
+    assert context.switched_to_fuzzy is False
+
+    # Complete tags and finished words aren't completed
+    assert Context('roflc testtag', '', user).completions == []
+    assert Context('testt ', '', user).completions == []
+
+
+def test_created_tags_are_completed(session, loaded_tag_index, user):
+    """Tags are added to the index, once they are created."""
+    Tag.get_or_create(session, 'unique_new', True)
+
+    context = Context('uniq', '', user)
+    assert [tag for tag, _ in context.completions] == ['unique_other', 'unique_new']
+
+
+def test_completions_dont_outrank_exact_matches(session, user):
+    """A sticker with several completions of the typed tag is ranked below an exact match."""
+    exact = sticker_factory(session, 'exact', ['kerm'])
+    completed = sticker_factory(session, 'completed', ['kermit', 'kermis', 'kermes'])
+    sticker_set_factory(session, 'muppets', [exact, completed])
+
+    # The typed tag has just been created by another instance and isn't part of the index yet
+    tag_index.load([('kermit', True, 3), ('kermis', True, 2), ('kermes', True, 1)], 2)
+    try:
+        context = Context('kerm', '', user)
+        assert len(context.completions) == 3
+
+        matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+        assert [result[0] for result in matching_stickers] == ['exact', 'completed']
+    finally:
+        tag_index.clear()
@@ -0,0 +1,43 @@
+"""Test the per-phase timing of inline search."""
+from stickerfinder.config import config
+from stickerfinder.telegram.inline_query.context import Context
+from stickerfinder.models import InlineQuery, InlineQueryRequest
+from stickerfinder.telegram.inline_query.search import get_matching_stickers, save_timings
+
+
+def test_search_phases_are_timed(session, strict_inline_search, user):
+    """All executed phases of a search are recorded."""
+    context = Context('roflcopter', '', user)
+    get_matching_stickers(session, context)
+
+    timings = context.timer.timings
+    for phase in ['context', 'build', 'strict', 'fuzzy']:
+        assert phase in timings
+        assert timings[phase] >= 0
+    assert 'favorites' not in timings
+
+    # Sampling is disabled by default
+    assert context.timer.samples == {}
+    assert context.timer.plans == {}
+
+
+def test_slow_query_plans_are_sampled(session, strict_inline_search, user, monkeypatch):
+    """Query plans are captured for queries above the threshold, but only after the search."""
+    monkeypatch.setattr(config, 'SEARCH_EXPLAIN_THRESHOLD', 0)
+    monkeypatch.setattr(config, 'SEARCH_EXPLAIN_SAMPLE_RATE', 1)
+
+    context = Context('testtag', '', user)
+    matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(session, context)
+    assert len(matching_stickers) == 50
+
+    # Nothing is explained before the user got an answer
+    assert set(context.timer.samples.keys()) == {'strict'}
+    assert context.timer.plans == {}
+
+    inline_query = InlineQuery.get_or_create(session, None, 'testtag', user)
+    inline_query_request = InlineQueryRequest(inline_query, 0)
+    save_timings(session, context, inline_query_request)
+
+    assert set(inline_query_request.query_plans.keys()) == {'strict'}
+    assert 'actual time' in inline_query_request.query_plans['strict']
+    assert inline_query_request.timings == context.timer.timings
@@ -0,0 +1,53 @@
+"""Test the batched writing of sticker usages."""
+import pytest
+
+from stickerfinder.helper.sticker_usage import UsageAggregator
+from stickerfinder.models import InlineQuery, Sticker, StickerUsage
+
+
+def test_usages_are_aggregated(session, strict_inline_search, user, admin):
+    """Usages are added to existing counts and the chosen stickers are set."""
+    sticker_usage = StickerUsage(user, session.query(Sticker).get('sticker_00'))
+    sticker_usage.usage_count = 5
+    session.add(sticker_usage)
+    first_query = InlineQuery.get_or_create(session, None, 'testtag', user)
+    second_query = InlineQuery.get_or_create(session, None, 'roflcopter', admin)
+    session.commit()
+
+    aggregator = UsageAggregator()
+    aggregator.add(user.id, 'sticker_00', first_query.id)
+    aggregator.add(user.id, 'sticker_00', first_query.id)
+    aggregator.add(admin.id, 'sticker_40', second_query.id)
+    # Deleted stickers are skipped
+    aggregator.add(admin.id, 'unknown_sticker', second_query.id)
+    aggregator.flush(session)
+    session.expire_all()
+
+    assert session.query(StickerUsage).get(['sticker_00', user.id]).usage_count == 7
+    assert session.query(StickerUsage).get(['sticker_40', admin.id]).usage_count == 1
+    assert session.query(StickerUsage).count() == 2
+    assert first_query.sticker_file_id == 'sticker_00'
+    assert second_query.sticker_file_id is None
+
+    # Nothing is written twice
+    aggregator.flush(session)
+    session.expire_all()
+    assert session.query(StickerUsage).get(['sticker_00', user.id]).usage_count == 7
+
+
+def test_failed_flush_keeps_usages(session, strict_inline_search, user, monkeypatch):
+    """Usages of a failed flush are written with the next one."""
+    user_id = user.id
+    aggregator = UsageAggregator()
+    aggregator.add(user_id, 'sticker_00', 1)
+
+    def fail():
+        raise ValueError()
+
+    monkeypatch.setattr(session, 'commit', fail)
+    with pytest.raises(ValueError):
+        aggregator.flush(session)
+
+    aggregator.add(user_id, 'sticker_00', 1)
+    assert aggregator.usages == {(user_id, 'sticker_00'): 2}
+    assert aggregator.chosen == {1: 'sticker_00'}
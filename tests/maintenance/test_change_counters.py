@@ -0,0 +1,36 @@
+"""Test the precomputed change counters of users."""
+from stickerfinder.models import User
+from stickerfinder.helper.tag import tag_sticker
+from stickerfinder.helper.maintenance import refresh_user_change_counters
+
+
+def test_tagging_increments_counters(session, user, sticker_set):
+    """Every change of a user increments the counters."""
+    for sticker in sticker_set.stickers:
+        tag_sticker(session, f'tag_{sticker.file_id}', sticker, user)
+
+    session.commit()
+    session.refresh(user)
+
+    assert user.change_count == len(sticker_set.stickers)
+    assert user.unchecked_change_count == len(sticker_set.stickers)
+    assert user.unchecked_international_change_count == 0
+
+
+def test_refresh_counters(session, user, sticker_set):
+    """Recompute the counters from the existing changes."""
+    for sticker in sticker_set.stickers:
+        tag_sticker(session, f'tag_{sticker.file_id}', sticker, user)
+    session.commit()
+
+    session.query(User).update({
+        'change_count': 0,
+        'unchecked_change_count': 0,
+    })
+    refresh_user_change_counters(session)
+    session.commit()
+    session.refresh(user)
+
+    assert user.change_count == len(sticker_set.stickers)
+    assert user.unchecked_change_count == len(sticker_set.stickers)
+    assert user.unchecked_international_change_count == 0
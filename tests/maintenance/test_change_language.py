@@ -0,0 +1,32 @@
+"""Test changing the language of a user check task."""
+from tests.helper import assert_sticker_contains_tags
+
+from stickerfinder.config import config
+from stickerfinder.models import Change, Tag, Task
+from stickerfinder.helper.maintenance import (
+    change_language_of_task_changes,
+    create_user_check_tasks,
+)
+from stickerfinder.helper.tag import tag_sticker
+
+
+def test_change_language_of_task_changes(session, user, sticker_set, tags, monkeypatch):
+    """Switch tags and changes to the other language and restore removed tags."""
+    monkeypatch.setattr(config, 'USER_CHECK_COUNT', len(sticker_set.stickers))
+    for sticker in sticker_set.stickers:
+        tag_sticker(session, f'new_tag_{sticker.file_id}', sticker, user, replace=True)
+
+    create_user_check_tasks(session, True)
+    session.commit()
+    task = session.query(Task).one()
+
+    change_language_of_task_changes(session, task)
+
+    assert not task.is_default_language
+    for change in session.query(Change).all():
+        assert not change.is_default_language
+
+    for sticker in sticker_set.stickers:
+        assert_sticker_contains_tags(sticker, [f'tag_{sticker.file_id}', f'new_tag_{sticker.file_id}'])
+        tag = session.query(Tag).get(f'new_tag_{sticker.file_id}')
+        assert not tag.is_default_language
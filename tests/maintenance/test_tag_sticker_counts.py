@@ -0,0 +1,56 @@
+"""Test the precomputed sticker counts of tags."""
+from sqlalchemy import func
+
+from tests.factories import user_factory
+from stickerfinder.models import Tag, sticker_tag
+from stickerfinder.helper.tag import add_original_emojis, tag_sticker
+from stickerfinder.helper.maintenance import (
+    refresh_tag_sticker_counts,
+    revert_user_changes,
+    undo_user_changes_revert,
+)
+
+
+def assert_sticker_counts(session):
+    """Compare the sticker counts of all tags with the actual amount of tagged stickers."""
+    session.expire_all()
+    counts = session.query(sticker_tag.c.tag_name, func.count(sticker_tag.c.sticker_file_id)) \
+        .group_by(sticker_tag.c.tag_name) \
+        .all()
+    counts = dict(counts)
+
+    for tag in session.query(Tag).all():
+        assert tag.sticker_count == counts.get(tag.name, 0), tag.name
+
+
+def test_tagging_counts_stickers(session, user, sticker_set):
+    """Adding, replacing and reverting tags keeps the sticker counts up to date."""
+    for sticker in sticker_set.stickers:
+        tag_sticker(session, f'shared tag_{sticker.file_id}', sticker, user)
+        add_original_emojis(session, sticker, '😂')
+    session.commit()
+    assert_sticker_counts(session)
+    assert session.query(Tag).get('shared').sticker_count == len(sticker_set.stickers)
+
+    ban_user = user_factory(session, 3, 'testuser2')
+    for sticker in sticker_set.stickers:
+        tag_sticker(session, 'banned shared', sticker, ban_user, replace=True)
+    session.commit()
+    assert_sticker_counts(session)
+
+    revert_user_changes(session, ban_user)
+    assert_sticker_counts(session)
+    assert session.query(Tag).get('banned').sticker_count == 0
+
+    undo_user_changes_revert(session, ban_user)
+    assert_sticker_counts(session)
+    assert session.query(Tag).get('banned').sticker_count == len(sticker_set.stickers)
+
+
+def test_refresh_sticker_counts(session, user, sticker_set, tags):
+    """Recompute the sticker counts from the tagged stickers."""
+    session.query(Tag).update({'sticker_count': 5})
+    refresh_tag_sticker_counts(session)
+    session.commit()
+
+    assert_sticker_counts(session)
@@ -0,0 +1,99 @@
+"""Test claiming tasks from the task queue."""
+from datetime import datetime, timedelta
+from telegram.error import Unauthorized
+
+from stickerfinder.models import Chat, Task
+from stickerfinder.helper.maintenance import check_maintenance_chat, distribute_tasks
+from stickerfinder.helper.task_queue import (
+    claim_next_task,
+    has_open_tasks,
+    live_chats,
+    PendingTaskCounter,
+)
+
+
+def test_claim_next_task(session, user):
+    """Tasks are claimed in order and assigned tasks are skipped."""
+    now = datetime.now()
+    tasks = []
+    for i in range(3):
+        task = Task(Task.CHECK_USER_TAGS, user=user)
+        task.created_at = now + timedelta(minutes=i)
+        session.add(task)
+        tasks.append(task)
+
+    reviewed_task = tasks[0]
+    reviewed_task.reviewed = True
+    session.commit()
+
+    chat = Chat(1, 'group')
+    session.add(chat)
+
+    task = claim_next_task(session, [Task.CHECK_USER_TAGS])
+    assert task == tasks[1]
+    chat.current_task = task
+
+    other_chat = Chat(2, 'group')
+    session.add(other_chat)
+
+    task = claim_next_task(session, [Task.CHECK_USER_TAGS])
+    assert task == tasks[2]
+    other_chat.current_task = task
+
+    assert claim_next_task(session, [Task.CHECK_USER_TAGS]) is None
+    assert not has_open_tasks(session, [Task.CHECK_USER_TAGS])
+    assert claim_next_task(session, [Task.REPORT]) is None
+
+
+def test_pending_task_counter(session, user):
+    """Counts are fetched once and adjusted afterwards."""
+    for _ in range(3):
+        session.add(Task(Task.CHECK_USER_TAGS, user=user))
+    session.commit()
+
+    counter = PendingTaskCounter(ttl=60)
+    assert counter.get(session, Task.CHECK_USER_TAGS) == 3
+
+    session.add(Task(Task.CHECK_USER_TAGS, user=user))
+    session.commit()
+    assert counter.get(session, Task.CHECK_USER_TAGS) == 3
+
+    counter.add(Task.CHECK_USER_TAGS, -1)
+    assert counter.get(session, Task.CHECK_USER_TAGS) == 2
+
+    counter.clear()
+    assert counter.get(session, Task.CHECK_USER_TAGS) == 4
+
+
+def test_dead_maintenance_chat(session, user, mocker):
+    """Chats, which can't be reached anymore, are deleted and their task is passed on."""
+    task = Task(Task.CHECK_USER_TAGS, user=user)
+    session.add(task)
+    dead_chat = Chat(1, 'group')
+    dead_chat.is_maintenance = True
+    session.add(dead_chat)
+    session.commit()
+
+    tg_chat = mocker.MagicMock()
+    tg_chat.send_message.side_effect = Unauthorized('Forbidden: bot was kicked from the group chat')
+    live_chats[1] = (tg_chat, float('inf'))
+
+    check_maintenance_chat(session, tg_chat, dead_chat, job=True)
+    session.commit()
+
+    assert session.query(Chat).get(1) is None
+    assert 1 not in live_chats
+    assert has_open_tasks(session, [Task.CHECK_USER_TAGS])
+
+    # The next idle chat gets the released task
+    live_chat = Chat(2, 'group')
+    live_chat.is_maintenance = True
+    session.add(live_chat)
+    session.commit()
+
+    bot = mocker.MagicMock()
+    distribute_tasks(bot, session)
+    assert live_chat.current_task == task
+    bot.get_chat.return_value.send_message.assert_called()
+
+    live_chats.pop(2, None)
@@ -0,0 +1,60 @@
+"""Test the creation of user check and report tasks."""
+from stickerfinder.config import config
+from stickerfinder.models import Change, Report, Task
+from stickerfinder.helper import maintenance
+from stickerfinder.helper.maintenance import (
+    create_report_tasks,
+    create_user_check_tasks,
+    mark_reports_inspected,
+)
+from stickerfinder.helper.tag import tag_sticker
+
+
+def test_create_user_check_tasks(session, user, sticker_set, monkeypatch):
+    """All unchecked changes of a user are assigned to a single new task."""
+    monkeypatch.setattr(config, 'USER_CHECK_COUNT', len(sticker_set.stickers))
+    for sticker in sticker_set.stickers:
+        tag_sticker(session, f'tag_{sticker.file_id}', sticker, user)
+
+    create_user_check_tasks(session, False)
+    assert session.query(Task).count() == 0
+
+    create_user_check_tasks(session, True)
+    session.commit()
+
+    task = session.query(Task).one()
+    assert task.type == Task.CHECK_USER_TAGS
+    assert task.user == user
+    assert task.is_default_language
+
+    changes = session.query(Change).all()
+    assert len(changes) == len(sticker_set.stickers)
+    for change in changes:
+        assert change.check_task == task
+
+    session.refresh(user)
+    assert user.unchecked_change_count == 0
+    assert user.change_count == len(sticker_set.stickers)
+
+    # No new task without new changes
+    create_user_check_tasks(session, True)
+    assert session.query(Task).count() == 1
+
+
+def test_reports_inspected_after_commit(session, user, sticker_set, monkeypatch):
+    """Reports are only skipped, once their run has been marked as committed."""
+    monkeypatch.setattr(config, 'REPORT_COUNT', 2)
+    monkeypatch.setattr(maintenance, 'last_inspected_report_id', 0)
+    report = Report(user, sticker_set, 'spam')
+    session.add(report)
+    session.commit()
+
+    tasks, newest_report_id = create_report_tasks(session)
+    assert tasks == []
+    assert newest_report_id == report.id
+
+    # Nothing has been committed yet, a failing run would inspect the report again
+    assert maintenance.last_inspected_report_id == 0
+
+    mark_reports_inspected(newest_report_id)
+    assert maintenance.last_inspected_report_id == report.id
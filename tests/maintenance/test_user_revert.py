@@ -69,3 +69,33 @@ def test_revert_add_user_tags(session, user, sticker_set, tags):
 
     for change in ban_user.changes:
         assert not change.reverted
+
+
+def test_revert_mixed_user_changes(session, user, sticker_set, tags):
+    """Reverting and undoing a sequence of adding, replacing and re-adding tags restores each state."""
+    ban_user = user_factory(session, 3, 'testuser2')
+
+    for sticker in sticker_set.stickers:
+        tag_sticker(session, 'banned_added', sticker, ban_user)
+        tag_sticker(session, 'banned_replaced', sticker, ban_user, replace=True)
+        tag_sticker(session, f'tag_{sticker.file_id}', sticker, ban_user)
+
+    session.commit()
+
+    revert_user_changes(session, ban_user)
+
+    for sticker in sticker_set.stickers:
+        assert_sticker_contains_tags(sticker, [f'tag_{sticker.file_id}'])
+        assert len(sticker.tags) == 1
+
+    for change in ban_user.changes:
+        assert change.reverted
+
+    undo_user_changes_revert(session, ban_user)
+
+    for sticker in sticker_set.stickers:
+        assert_sticker_contains_tags(sticker, [f'tag_{sticker.file_id}', 'banned_replaced'])
+        assert len(sticker.tags) == 2
+
+    for change in ban_user.changes:
+        assert not change.reverted
@@ -0,0 +1,28 @@
+"""Test the random sticker set selection."""
+from tests.factories import sticker_set_factory
+
+from stickerfinder.helper.sticker_set import get_random_sticker_set, get_first_sticker
+
+
+def test_random_set(session, sticker_set):
+    """A valid set is found, even if the table sample doesn't contain it."""
+    random_set = get_random_sticker_set(session)
+    assert random_set == sticker_set
+
+    first_sticker = get_first_sticker(session, random_set)
+    assert first_sticker == sticker_set.stickers[0]
+
+
+def test_random_set_ignores_invalid_sets(session, sticker_set):
+    """Banned, nsfw, furry and empty sets are never picked."""
+    sticker_set_factory(session, 'empty_set')
+    sticker_set.banned = True
+    session.commit()
+
+    assert get_random_sticker_set(session) is None
+
+    sticker_set.banned = False
+    sticker_set.nsfw = True
+    session.commit()
+
+    assert get_random_sticker_set(session) is None
@@ -0,0 +1,17 @@
+"""Test the denormalized sticker data of sticker sets."""
+from stickerfinder.models import StickerSet
+
+
+def test_refresh_sticker_data(session, sticker_set):
+    """Sticker count and previews match the set's stickers."""
+    assert sticker_set.sticker_count == len(sticker_set.stickers)
+
+    expected = [sticker.file_id for sticker in sticker_set.stickers[:StickerSet.PREVIEW_COUNT]]
+    assert sticker_set.preview_file_ids == expected
+
+    sticker_set.stickers = sticker_set.stickers[:2]
+    sticker_set.refresh_sticker_data(session)
+    session.commit()
+
+    assert sticker_set.sticker_count == 2
+    assert sticker_set.preview_file_ids == [sticker.file_id for sticker in sticker_set.stickers]
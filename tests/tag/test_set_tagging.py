@@ -0,0 +1,13 @@
+"""Test tagging a whole sticker set."""
+from stickerfinder.helper.tag import get_next_set_sticker
+
+
+def test_next_set_sticker(session, sticker_set):
+    """Walk through the set in the same order as `StickerSet.stickers`."""
+    stickers = sticker_set.stickers
+    sticker = stickers[0]
+    for expected in stickers[1:]:
+        sticker = get_next_set_sticker(session, sticker)
+        assert sticker == expected
+
+    assert get_next_set_sticker(session, sticker) is None
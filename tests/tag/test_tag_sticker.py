@@ -1,7 +1,7 @@
 """Test the normal tagging process."""
 from tests.helper import assert_sticker_contains_tags
 
-from stickerfinder.models import Tag
+from stickerfinder.models import Change, Tag
 from stickerfinder.helper.tag import tag_sticker
 
 
@@ -77,3 +77,25 @@ def test_add_duplicate_sticker_tags_in_other_language(session, user, sticker_set
 
     assert tag.is_default_language
     assert len(user.changes) == 1
+
+
+def test_tag_with_existing_and_new_tags(session, user, sticker_set, tags):
+    """Tag a sticker with a mix of existing, already assigned and new tags."""
+    sticker = sticker_set.stickers[0]
+    other_sticker = sticker_set.stickers[1]
+    text = f'tag_{sticker.file_id} tag_{other_sticker.file_id} brand_new_tag'
+    tag_sticker(session, text, sticker, user)
+
+    session.commit()
+
+    assert_sticker_contains_tags(sticker, [f'tag_{sticker.file_id}', f'tag_{other_sticker.file_id}', 'brand_new_tag'])
+
+    # Only the tags which weren't on the sticker yet are part of the change
+    change = session.query(Change) \
+        .filter(Change.user == user) \
+        .order_by(Change.id.desc()) \
+        .first()
+    assert set(tag.name for tag in change.added_tags) == set([f'tag_{other_sticker.file_id}', 'brand_new_tag'])
+
+    # Existing tags are reused
+    assert session.query(Tag).filter(Tag.name == f'tag_{other_sticker.file_id}').count() == 1
@@ -0,0 +1,43 @@
+"""Test the connection pool metrics."""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm.session import sessionmaker
+
+from stickerfinder import db
+from stickerfinder.db import MeasuredQueuePool, get_pool_status, session_scope
+
+
+@pytest.yield_fixture
+def measured_engine(engine, monkeypatch):
+    """Use a measured engine on the test database for the whole db module."""
+    measured_engine = create_engine(engine.url, poolclass=MeasuredQueuePool, pool_size=2, max_overflow=0)
+    monkeypatch.setattr(db, 'engine', measured_engine)
+    monkeypatch.setattr(db, 'Session', sessionmaker(bind=measured_engine))
+    yield measured_engine
+    measured_engine.dispose()
+
+
+def test_pool_status(measured_engine):
+    """Checkouts and wait times are recorded for each acquired connection."""
+    before = get_pool_status()
+    with measured_engine.connect() as connection:
+        connection.execute('SELECT current_database()')
+        during = get_pool_status()
+
+    assert during['checkouts'] == before['checkouts'] + 1
+    assert during['checked_out'] == before['checked_out'] + 1
+    assert during['max_wait'] >= 0
+    assert get_pool_status()['checked_out'] == before['checked_out']
+
+
+def test_session_scope_rolls_back(measured_engine):
+    """Failing scopes don't leak connections."""
+    before = get_pool_status()
+    try:
+        with session_scope() as session:
+            assert session.execute('SELECT current_database()').scalar() == measured_engine.url.database
+            raise ValueError()
+    except ValueError:
+        pass
+
+    assert get_pool_status()['checked_out'] == before['checked_out']
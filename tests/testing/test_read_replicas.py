@@ -0,0 +1,96 @@
+"""Test routing of read-only sessions to read replicas."""
+from copy import copy
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from stickerfinder import db
+from stickerfinder.db import ReadEngineRouter, base, read_session_scope
+from stickerfinder.telegram.inline_query.context import Context
+from stickerfinder.telegram.inline_query.search import get_matching_stickers
+from tests.factories import sticker_factory, sticker_set_factory
+
+
+def test_round_robin(engine):
+    """Replicas are used in turns."""
+    replica = create_engine('postgresql://localhost/stickerfinder_test')
+    router = ReadEngineRouter([engine, replica])
+
+    assert router.get_engine() is engine
+    assert router.get_engine() is replica
+    assert router.get_engine() is engine
+
+
+def test_unhealthy_replica_is_skipped(engine):
+    """Replicas with connection errors are skipped, until they may be retried."""
+    broken_replica = create_engine('postgresql://localhost:1/stickerfinder_test')
+    router = ReadEngineRouter([broken_replica, engine], retry_after=60)
+
+    with pytest.raises(OperationalError):
+        broken_replica.connect()
+
+    assert router.get_engine() is engine
+    assert router.get_engine() is engine
+
+    # Without any healthy replica, reads fall back to the primary
+    router.mark_unhealthy(engine)
+    assert router.get_engine() is None
+
+
+def test_fallback_to_primary(session):
+    """Without configured replicas the primary session is used."""
+    with read_session_scope(session) as read_session:
+        assert read_session is session
+
+
+@pytest.yield_fixture(scope='module')
+def replica_engine(engine):
+    """Create a second database, which acts as a read replica."""
+    admin_url = copy(engine.url)
+    admin_url.database = 'postgres'
+    admin_engine = create_engine(admin_url, isolation_level='AUTOCOMMIT')
+    with admin_engine.connect() as connection:
+        connection.execute('DROP DATABASE IF EXISTS stickerfinder_test_replica')
+        connection.execute('CREATE DATABASE stickerfinder_test_replica')
+
+    replica_url = copy(engine.url)
+    replica_url.database = 'stickerfinder_test_replica'
+    replica_engine = create_engine(replica_url)
+    with replica_engine.connect() as connection:
+        connection.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+    base.metadata.create_all(replica_engine)
+
+    yield replica_engine
+
+    replica_engine.dispose()
+    with admin_engine.connect() as connection:
+        connection.execute('DROP DATABASE stickerfinder_test_replica')
+    admin_engine.dispose()
+
+
+def test_search_runs_on_replica(session, user, replica_engine, monkeypatch):
+    """Searches inside a read session are answered by the replica."""
+    # Only the replica knows about this sticker
+    replica_session = Session(bind=replica_engine)
+    sticker = sticker_factory(replica_session, 'replica_sticker', ['replicatag'])
+    sticker_set_factory(replica_session, 'replica_set', [sticker])
+    replica_session.close()
+
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(replica_engine, 'before_cursor_execute', record_statement)
+    monkeypatch.setattr(db, 'read_engines', ReadEngineRouter([replica_engine]))
+    try:
+        context = Context('replicatag', '', user)
+        with read_session_scope(session) as read_session:
+            assert read_session.get_bind().url.database == 'stickerfinder_test_replica'
+            matching_stickers, fuzzy_matching_stickers, duration = get_matching_stickers(read_session, context)
+    finally:
+        event.remove(replica_engine, 'before_cursor_execute', record_statement)
+
+    assert [row[0] for row in matching_stickers] == ['replica_sticker']
+    assert any('sticker_tag' in statement for statement in statements)
@@ -0,0 +1,38 @@
+"""Test the session handling of telegram handlers."""
+from unittest.mock import MagicMock
+from telegram.error import Unauthorized
+
+from stickerfinder.helper import session as session_helper
+from stickerfinder.helper.session import session_wrapper
+
+
+def run_handler(monkeypatch, handler, allowed=True):
+    """Run a handler with a mocked session and return the session."""
+    session = MagicMock()
+    monkeypatch.setattr(session_helper, 'get_session', lambda: session)
+    monkeypatch.setattr(session_helper, 'get_user', lambda session, update: MagicMock())
+    monkeypatch.setattr(session_helper, 'is_allowed', lambda *args, **kwargs: allowed)
+    monkeypatch.setattr(session_helper.Chat, 'get_or_create', lambda session, chat_id, chat_type: MagicMock())
+
+    session_wrapper()(handler)(MagicMock(), MagicMock())
+
+    return session
+
+
+def test_blocked_bot_keeps_chat(monkeypatch):
+    """Chats of users, who blocked the bot, are neither deleted nor is anything committed."""
+    def handler(bot, update, session, chat, user):
+        raise Unauthorized('Forbidden: bot was blocked by the user')
+
+    session = run_handler(monkeypatch, handler)
+    session.rollback.assert_called_once()
+    session.delete.assert_not_called()
+    session.commit.assert_not_called()
+    session.close.assert_called_once()
+
+
+def test_forbidden_update_isnt_committed(monkeypatch):
+    """Nothing is committed, if the user isn't allowed to use the handler."""
+    session = run_handler(monkeypatch, MagicMock(), allowed=False)
+    session.commit.assert_not_called()
+    session.close.assert_called_once()